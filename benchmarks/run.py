@@ -0,0 +1,294 @@
+"""Rules engine benchmarks.
+
+    python -m benchmarks.run                           # 1k, 100k and 1M tips
+    python -m benchmarks.run --sizes 1000 100000 --save benchmarks/baselines/local.json
+    python -m benchmarks.run --baseline benchmarks/baselines/local.json
+
+For each synthetic catalog size this reports:
+
+* micro: cost of one ``evaluate`` per rule type, plus the string-level
+  ``evaluate_rule`` and ``get_appliance_from_rule`` helpers;
+* build: time and memory to compile/index the catalog and to build and open
+  the memory-mapped cache;
+* macro: per-customer latency of the category verification step (the
+  planner and rule evaluation the engine runs) and of the full eligibility
+  evaluation (and of the NumPy batch path when available). Lazily built
+  catalog indexes are warmed first, and a fixed season keeps runs comparable.
+
+Results can be saved as JSON and compared against a saved baseline; any metric
+more than ``--tolerance`` slower/larger than the baseline is reported as a
+regression and the exit status is 1.
+
+Before measuring, ``check_profile_coalescing`` makes sure concurrent profile
+fetches of the same customer share one backend call; a failure also exits 1.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.synthetic import generate_catalog, generate_profiles
+from smarttips.catalog import TipCatalog
+from smarttips.engine import RecommendationEngine, detect_potential_categories
+from smarttips.profiles import ProfileProvider, SimulatedProfileBackend
+from smarttips.rules import compile_rule, evaluate_rule, get_appliance_from_rule
+from smarttips.store import open_catalog_cache, write_catalog_cache
+
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+SEASON = "winter"  # Fixed, so results do not depend on the date
+
+
+def _ns_per_call(fn, args_list, repeat=3):
+    """Best-of-``repeat`` average nanoseconds per call of fn(*args)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for args in args_list:
+            fn(*args)
+        elapsed = (time.perf_counter_ns() - start) / len(args_list)
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 1)
+
+
+def _latency_summary(samples_ns):
+    samples_ms = sorted(sample / 1e6 for sample in samples_ns)
+    return {
+        "mean": round(statistics.fmean(samples_ms), 4),
+        "p50": round(samples_ms[len(samples_ms) // 2], 4),
+        "p95": round(samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.95))], 4),
+        "max": round(samples_ms[-1], 4),
+    }
+
+
+def _measure_memory(fn):
+    """Returns (result, bytes still allocated by fn's result, peak bytes during fn)."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current - before, peak - before
+
+
+class _CountingBackend(SimulatedProfileBackend):
+    """Simulated backend that counts the custids it is asked for."""
+
+    def __init__(self, latency):
+        super().__init__(latency)
+        self.requested = []
+        self._lock = threading.Lock()
+
+    async def fetch(self, custid):
+        with self._lock:
+            self.requested.append(custid)
+        return await super().fetch(custid)
+
+    async def fetch_many(self, custids):
+        with self._lock:
+            self.requested.extend(custids)
+        return await super().fetch_many(custids)
+
+
+def check_profile_coalescing(threads=8, latency=0.05):
+    """Returns a list of problems with concurrent fetches of the same custids (empty if none).
+
+    Overlapping bulk and single fetches of one custid must share a single
+    backend request and all succeed.
+    """
+    backend = _CountingBackend(latency)
+    provider = ProfileProvider(backend)
+    calls = [lambda: provider.get_profiles(["Z", "W"]) for _ in range(threads)]
+    calls += [lambda: provider.get_profile("Z") for _ in range(threads // 2)]
+    problems = []
+    try:
+        with ThreadPoolExecutor(len(calls)) as pool:
+            futures = [pool.submit(call) for call in calls]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    problems.append(f"concurrent fetch failed: {e!r}")
+    finally:
+        provider.close()
+    for custid in ("Z", "W"):
+        count = backend.requested.count(custid)
+        if count != 1:
+            problems.append(f"{custid} was requested from the backend {count} times, expected once")
+    return problems
+
+
+def bench_micro(catalog, profiles):
+    """Per-evaluation cost of each rule type (nanoseconds)."""
+    by_type = {}
+    for rule in {id(rule): rule for rule in catalog.rules}.values():
+        cost = _ns_per_call(rule.evaluate, [(profile,) for profile in profiles])
+        by_type.setdefault(type(rule).__name__, []).append(cost)
+    results = {f"evaluate_ns.{name}": round(statistics.fmean(costs), 1) for name, costs in sorted(by_type.items())}
+    sources = [(rule.source,) for rule in catalog.rules[:1000]]
+    results["get_appliance_from_rule_ns"] = _ns_per_call(get_appliance_from_rule, sources)
+    results["compile_rule_cached_ns"] = _ns_per_call(compile_rule, sources)
+    results["evaluate_rule_ns"] = _ns_per_call(
+        evaluate_rule, [(source, profiles[i % len(profiles)]) for i, (source,) in enumerate(sources)])
+    return results
+
+
+def bench_build(tips):
+    results = {}
+    start = time.perf_counter()
+    catalog = TipCatalog(tips, version="bench")
+    results["catalog_build_s"] = round(time.perf_counter() - start, 4)
+
+    _, retained, peak = _measure_memory(lambda: TipCatalog(tips, version="bench"))
+    results["catalog_index_bytes"] = retained
+    results["catalog_build_peak_bytes"] = peak
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.stcat")
+        start = time.perf_counter()
+        write_catalog_cache(path, tips, "0123456789abcdef")
+        results["cache_write_s"] = round(time.perf_counter() - start, 4)
+        results["cache_file_bytes"] = os.path.getsize(path)
+        start = time.perf_counter()
+        mapped = open_catalog_cache(path)
+        results["cache_open_s"] = round(time.perf_counter() - start, 4)
+        _, retained, _ = _measure_memory(lambda: open_catalog_cache(path))
+        results["cache_open_heap_bytes"] = retained
+        del mapped
+    return catalog, results
+
+
+def _verify(catalog, profile):
+    """The verification stage of RecommendationEngine eligibility, without its memo."""
+    equipment_matches = catalog.match_equipment(profile)
+    return {category: catalog.matching_positions(category, profile, equipment_matches, SEASON)
+            for category in detect_potential_categories(profile)}
+
+
+def bench_macro(catalog, profiles):
+    results = {}
+    # Untimed pass: builds TipQuery, the equipment index and the planner's candidate
+    # cache, which every process builds once, so the samples measure steady state
+    for profile in profiles:
+        _verify(catalog, profile)
+    verification = []
+    for profile in profiles:
+        start = time.perf_counter_ns()
+        _verify(catalog, profile)
+        verification.append(time.perf_counter_ns() - start)
+    results["verification_ms"] = _latency_summary(verification)
+
+    engine = RecommendationEngine(catalog)
+    end_to_end = []
+    for profile in profiles:  # Distinct custids, so the result memo never hits
+        start = time.perf_counter_ns()
+        engine.eligibility(profile, catalog, SEASON)
+        end_to_end.append(time.perf_counter_ns() - start)
+    results["per_customer_ms"] = _latency_summary(end_to_end)
+
+    try:
+        from smarttips.batch import BatchEvaluator
+    except ImportError:  # NumPy not installed
+        return results
+    evaluator = BatchEvaluator(catalog)
+    start = time.perf_counter_ns()
+    evaluator.eligibility(profiles, packed=True)
+    results["batch_per_customer_ms"] = round((time.perf_counter_ns() - start) / 1e6 / len(profiles), 4)
+    return results
+
+
+def run(sizes, profile_count, seed=0, log=print):
+    profiles = generate_profiles(profile_count)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "profiles": profile_count,
+            "seed": seed,
+        },
+        "results": {},
+    }
+    for size in sizes:
+        log(f"-- {size} tips")
+        tips = generate_catalog(size, seed=seed)
+        catalog, results = bench_build(tips)
+        results.update(bench_micro(catalog, profiles))
+        results.update(bench_macro(catalog, profiles))
+        report["results"][str(size)] = results
+        for name, value in _flatten(results).items():
+            log(f"   {name:40} {value}")
+    return report
+
+
+def _flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(report, baseline, tolerance):
+    """Returns a list of regression messages (every metric is lower-is-better).
+
+    Single-sample maxima are too noisy to compare and are skipped.
+    """
+    regressions = []
+    current = _flatten(report["results"])
+    for name, old in _flatten(baseline["results"]).items():
+        new = current.get(name)
+        if new is None or name.endswith(".max") or not isinstance(old, (int, float)) or old <= 0:
+            continue
+        if new > old * (1 + tolerance):
+            regressions.append(f"{name}: {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Rules engine benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Catalog sizes (tips)")
+    parser.add_argument("--profiles", type=int, default=200, help="Synthetic customer profiles per size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="Write the results as JSON to this path")
+    parser.add_argument("--baseline", help="Compare against a saved JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs. baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("smarttips").setLevel(logging.ERROR)  # Unparsable synthetic rules are expected
+    problems = check_profile_coalescing()
+    if problems:
+        print("Profile fetch coalescing check failed:")
+        for message in problems:
+            print(f"   {message}")
+        return 1
+    report = run(args.sizes, args.profiles, seed=args.seed)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {args.baseline}:")
+            for message in regressions:
+                print(f"   {message}")
+            return 1
+        print(f"No regressions against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""Synthetic tip catalogs and customer profiles for benchmarks.
+
+Catalogs follow the schema of ``Xcel Tips - 250313.json`` (rowid, headline,
+description, fuel, sub_id1, sub_id2, user_type, rule, category) and roughly
+its rule mix, where most tips are ``Always`` rules. Profiles come from the
+same simulation the app uses.
+"""
+import random
+
+from smarttips.profiles import SimulatedProfileBackend
+
+# (rule, weight) roughly matching the distribution in the real catalog
+RULE_MIX = (
+    ("Always", 186),
+    ("If match on All five Keys", 6),
+    ("If Insulation Pre 1992", 4),
+    ("If Rate Plan = TOU", 3),
+    ('If Dryer = "Yes"', 3),
+    ('If Ducts Not Equal to "No Ducts"', 3),
+    ('If CFLs not Equal to "All" Changed', 3),
+    ('If Pool equals "Yes"', 3),
+    ('If Freezer = "Yes"', 2),
+    ('If Washer = "Yes"', 2),
+    ("If Pool Heater Greater than 0 Months", 2),
+    ('If Hot Tub equals "Yes"', 2),
+    ('If Water Heater Electric = "Yes"', 2),
+    ('If Dishwasher = "Yes"', 1),
+    ('If Cool Equals "Yes"', 1),
+    ('If Programmable Thermostat "No"', 1),
+)
+CATEGORIES = (("general-tip", 188), ("seasonal-spring", 17), ("seasonal-winter", 16),
+              ("seasonal-summer", 2), ("seasonal-fall", 1))
+USER_TYPES = (("residential", 134), ("commercial", 73), ("res&com", 17))
+# Equipment keys used by "If match on All five Keys" tips
+EQUIPMENT_KEYS = (
+    ("Gas", "Central/Forced Air", "Furnace"),
+    ("Electric", "Central/Forced Air", "Heat Pump"),
+    ("Electric", "Distributed Cooling", "AC Unit"),
+    ("Electric", "Tankless", "Water Heating"),
+    ("Propane", "Heat", "Fireplace"),
+    ("E", "Freezer", "Freezer"),
+)
+_WORDS = ("energy", "save", "thermostat", "insulation", "window", "heater", "pool", "pump", "freezer",
+          "laundry", "dryer", "lighting", "LED", "ducts", "seal", "summer", "winter", "rate", "peak", "bill")
+
+
+def _weighted(rng, pairs, count):
+    values, weights = zip(*pairs)
+    return rng.choices(values, weights=weights, k=count)
+
+
+def generate_catalog(size, seed=0):
+    """Returns ``size`` synthetic tips as a list of dicts."""
+    rng = random.Random(seed)
+    rules = _weighted(rng, RULE_MIX, size)
+    categories = _weighted(rng, CATEGORIES, size)
+    user_types = _weighted(rng, USER_TYPES, size)
+    tips = []
+    for index in range(size):
+        fuel = sub_id1 = sub_id2 = ""
+        if rules[index] == "If match on All five Keys":
+            fuel, sub_id1, sub_id2 = rng.choice(EQUIPMENT_KEYS)
+        words = rng.sample(_WORDS, 6)
+        tips.append({
+            "rowid": index + 1,
+            "headline": " ".join(words[:4]).capitalize(),
+            "description": " ".join(words + rng.sample(_WORDS, 6)).capitalize() + ".",
+            "fuel": fuel,
+            "sub_id1": sub_id1,
+            "sub_id2": sub_id2,
+            "user_type": user_types[index],
+            "rule": rules[index],
+            "category": categories[index],
+        })
+    return tips
+
+
+def generate_profiles(count, prefix="SYN"):
+    """Returns ``count`` simulated customer profiles with distinct custids."""
+    return [SimulatedProfileBackend.build_profile(f"{prefix}{index}") for index in range(count)]
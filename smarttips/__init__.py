@@ -0,0 +1,48 @@
+"""SmartTips recommendation engine.
+
+Public names are imported lazily on first access, so ``import smarttips`` (and
+the CLI) only pays for the modules it actually uses.
+"""
+import importlib
+
+_LAZY_EXPORTS = {
+    "CompiledRule": "smarttips.rules",
+    "compile_catalog": "smarttips.rules",
+    "compile_rule": "smarttips.rules",
+    "evaluate_rule": "smarttips.rules",
+    "get_appliance_from_rule": "smarttips.rules",
+    "rule_errors": "smarttips.rules",
+    "TipCatalog": "smarttips.catalog",
+    "TipQuery": "smarttips.query",
+    "current_season": "smarttips.query",
+    "EquipmentKeyIndex": "smarttips.equipment",
+    "ProfileRecord": "smarttips.record",
+    "ProfileTable": "smarttips.record",
+    "ProfileProvider": "smarttips.profiles",
+    "SimulatedProfileBackend": "smarttips.profiles",
+    "TTLCache": "smarttips.profiles",
+    "CatalogError": "smarttips.catalog",
+    "CatalogStore": "smarttips.store",
+    "load_compiled_catalog": "smarttips.store",
+    "RecommendationEngine": "smarttips.engine",
+    "RecommendationStore": "smarttips.materialized",
+    "SearchIndex": "smarttips.search",
+    "detect_potential_categories": "smarttips.engine",
+    "load_catalog": "smarttips.engine",
+    "load_tips": "smarttips.engine",
+}
+
+__all__ = sorted(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    module = _LAZY_EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'smarttips' has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,5 @@
+import sys
+
+from smarttips.cli import main
+
+sys.exit(main())
@@ -0,0 +1,198 @@
+"""Vectorized eligibility for many profiles at once.
+
+Profiles are encoded column by column (one set of NumPy arrays per rule
+attribute) and every distinct compiled rule is evaluated as a single array
+operation over all customers. The result is a customers x tips boolean matrix
+that matches ``TipCatalog.matching_positions`` profile by profile: rule
+results, plus equipment-key matches, masked by the catalog's user_type (and
+optionally season) partitions.
+
+Requires NumPy, which the interactive app does not need.
+"""
+import numpy as np
+
+from smarttips.record import FIELD_INDEX, MISSING, ProfileRecord, ProfileTable
+from smarttips.rules import (
+    RULE_ATTRIBUTES,
+    AlwaysRule,
+    EqualsRule,
+    EquipmentKeyRule,
+    FlagRule,
+    GreaterThanRule,
+    NeverRule,
+    NotEqualRule,
+)
+
+class AttributeColumn:
+    """Columnar encoding of one profile attribute across customers.
+
+    Mirrors the value types ``evaluate`` distinguishes: missing values, bools
+    and everything else (compared via ``str()`` or ``float()``).
+    """
+    __slots__ = ("present", "is_bool", "bools", "codes", "vocabulary", "numbers")
+
+    def __init__(self, values):
+        size = len(values)
+        self.present = np.zeros(size, dtype=bool)
+        self.is_bool = np.zeros(size, dtype=bool)
+        self.bools = np.zeros(size, dtype=bool)
+        self.codes = np.full(size, -1, dtype=np.int32)
+        self.numbers = np.full(size, np.nan, dtype=np.float64)
+        self.vocabulary = {}
+        for row, value in enumerate(values):
+            if value is MISSING:
+                continue
+            self.present[row] = True
+            if isinstance(value, bool):
+                self.is_bool[row] = True
+                self.bools[row] = value
+            else:
+                self.codes[row] = self.vocabulary.setdefault(str(value), len(self.vocabulary))
+            try:
+                self.numbers[row] = float(value)
+            except (ValueError, TypeError):
+                pass
+
+    def code_for(self, value):
+        return self.vocabulary.get(value, -1)
+
+
+def _attribute_values(profiles, attribute):
+    if isinstance(profiles, ProfileTable):
+        return profiles.column(attribute)
+    index = FIELD_INDEX[attribute]
+    return [profile.values[index] if type(profile) is ProfileRecord else profile.get(attribute, MISSING)
+            for profile in profiles]
+
+
+class ProfileColumns:
+    """Profiles encoded as one AttributeColumn per rule attribute.
+
+    ``profiles`` may be a list of ProfileRecords/dicts or a ProfileTable,
+    whose columns are used as they are.
+    """
+
+    def __init__(self, profiles, attributes=RULE_ATTRIBUTES):
+        self.size = len(profiles)
+        self.columns = {attribute: AttributeColumn(_attribute_values(profiles, attribute))
+                        for attribute in attributes}
+
+    def __len__(self):
+        return self.size
+
+    def column(self, attribute):
+        column = self.columns.get(attribute)
+        if column is None:
+            column = self.columns[attribute] = AttributeColumn([MISSING] * self.size)
+        return column
+
+
+def _equals(rule, columns):
+    column = columns.column(rule.attribute)
+    matches = np.where(column.is_bool, column.bools == rule.flag, column.codes == column.code_for(rule.value))
+    return column.present & matches
+
+
+def _not_equal(rule, columns):
+    column = columns.column(rule.attribute)
+    matches = np.where(column.is_bool, column.bools != rule.flag, column.codes != column.code_for(rule.value))
+    return column.present & matches
+
+
+def _greater_than(rule, columns):
+    # NaN (missing or non-numeric) compares False, like the failed float() path
+    return columns.column(rule.attribute).numbers > rule.value
+
+
+def _flag(rule, columns):
+    column = columns.column(rule.attribute)
+    return column.is_bool & column.bools
+
+
+def _always(rule, columns):
+    return np.ones(len(columns), dtype=bool)
+
+
+def _never(rule, columns):
+    return np.zeros(len(columns), dtype=bool)
+
+
+_VECTOR_EVALUATORS = {
+    AlwaysRule: _always,
+    NeverRule: _never,
+    EquipmentKeyRule: _never,  # Resolved per customer through the catalog's equipment index
+    FlagRule: _flag,
+    EqualsRule: _equals,
+    NotEqualRule: _not_equal,
+    GreaterThanRule: _greater_than,
+}
+
+
+def evaluate_rule_column(rule, columns):
+    """Evaluates one compiled rule for every encoded profile."""
+    try:
+        evaluator = _VECTOR_EVALUATORS[type(rule)]
+    except KeyError:
+        raise TypeError(f"No vectorized evaluator for {type(rule).__name__}") from None
+    return evaluator(rule, columns)
+
+
+class BatchEvaluator:
+    """Evaluates a TipCatalog against many profiles at once."""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        # Tips sharing a rule string share one compiled rule; evaluate each once
+        self._unique_rules = []
+        positions = {}
+        rule_index = []
+        for rule in catalog.rules:
+            if id(rule) not in positions:
+                positions[id(rule)] = len(self._unique_rules)
+                self._unique_rules.append(rule)
+            rule_index.append(positions[id(rule)])
+        self._rule_index = np.asarray(rule_index, dtype=np.intp)
+
+    def encode(self, profiles):
+        return profiles if isinstance(profiles, ProfileColumns) else ProfileColumns(profiles)
+
+    def eligibility(self, profiles, packed=False, season=None):
+        """Returns a customers x tips boolean matrix (or packbits of it if packed).
+
+        Equipment-key tips are matched per customer, so they need the profile
+        dicts; pre-encoded ProfileColumns leave those tips False. ``season``
+        limits seasonal tips to that season.
+        """
+        columns = self.encode(profiles)
+        results = np.empty((len(self._unique_rules), len(columns)), dtype=bool)
+        for row, rule in enumerate(self._unique_rules):
+            results[row] = evaluate_rule_column(rule, columns)
+        matrix = np.ascontiguousarray(results[self._rule_index].T)
+        if self.catalog.has_equipment_rules and not isinstance(profiles, ProfileColumns):
+            for row, profile in enumerate(profiles):
+                for positions in self.catalog.match_equipment(profile).values():
+                    matrix[row, list(positions)] = True
+        self._apply_filters(matrix, columns, season)
+        if packed:
+            return np.packbits(matrix, axis=1)
+        return matrix
+
+    def _apply_filters(self, matrix, columns, season):
+        """Clears the tips the query planner excludes, per distinct customer user type."""
+        query = self.catalog.query
+        user_types = columns.column("user_type")
+        groups = [(value, user_types.codes == code) for value, code in user_types.vocabulary.items()]
+        groups.append((None, user_types.codes == -1))  # Missing or non-string user types
+        for value, rows in groups:
+            if not rows.any():
+                continue
+            steps = query.plan(None, value, season)
+            if steps is None:
+                matrix[rows] = False
+                continue
+            for step in steps:
+                matrix[rows] &= np.frombuffer(step.mask, dtype=bool)
+
+    def unpack(self, packed):
+        """Inverse of ``eligibility(..., packed=True)``."""
+        return np.unpackbits(packed, axis=1, count=len(self.catalog)).astype(bool)
@@ -0,0 +1,225 @@
+"""Tip catalog with a category index built once at load time."""
+import hashlib
+import json
+import threading
+from collections import Counter
+
+from smarttips import metrics
+from smarttips.equipment import EQUIPMENT_ATTRIBUTE, EquipmentKeyIndex
+from smarttips.query import TipQuery
+from smarttips.search import SearchIndex
+from smarttips.rules import UNSUPPORTED_RULES, EquipmentKeyRule, compile_catalog, log_rule_errors
+
+
+class CatalogError(Exception):
+    """Raised when the tip catalog cannot be loaded."""
+
+
+def catalog_version(raw):
+    """Version identifier for catalog file contents (stable across processes)."""
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def parse_tips(raw, filepath):
+    """Parses catalog JSON bytes into a list of tip objects."""
+    try:
+        data = json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise CatalogError(f"Could not decode JSON from {filepath}.") from None
+    if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+        raise CatalogError(f"JSON structure in {filepath} is not a list of objects.")
+    return data
+
+
+def read_catalog_file(filepath):
+    """Returns the raw bytes of a catalog file."""
+    try:
+        with open(filepath, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        raise CatalogError(f"The file {filepath} was not found.") from None
+
+
+def load_tips(filepath):
+    """Loads the tip catalog JSON (a list of tip objects)."""
+    return parse_tips(read_catalog_file(filepath), filepath)
+
+
+class TipCatalog:
+    """Tips with their compiled rules, indexed by category.
+
+    The category of every tip is computed once, so looking up the tips of a
+    category (General, Freezer, Pool Heater, Rate Plan, ...) no longer scans
+    the whole catalog. ``tips`` may be a list of dicts or any sequence of tip
+    mappings (see smarttips.store for the memory-mapped form); ``rules`` and
+    ``category_index`` can be passed in when they were precompiled.
+
+    Profile lookups only consider tips for the customer's user type (and the
+    given season, if any); ``query`` holds the partitions that plan this.
+    ``search_index`` is the free-text index over headlines and descriptions.
+    """
+
+    def __init__(self, tips, version=None, rules=None, category_index=None):
+        self.tips = tips
+        self.version = version
+        # Tips share compiled rules, so per-rule checks only need the distinct ones
+        if rules is None:
+            rules = compile_catalog(tips)
+            rule_counts = Counter(rules)
+        else:
+            rule_counts = Counter(rules)
+            log_rule_errors(rule_counts)
+        self.rules = rules
+        if category_index is None:
+            category_index = {}
+            for position, rule in enumerate(rules):
+                category_index.setdefault(rule.category, []).append(position)
+        self._by_category = category_index  # category -> tip positions
+        self._query = None  # Built on first use
+        self._equipment_index = None  # Built on first use
+        self._equipment_lock = threading.Lock()
+        self._search_index = None  # Built on first use (or warmed by CatalogStore)
+        self._search_lock = threading.Lock()
+        self._dependencies = None  # Built on first use by dependents()
+
+        unusable = {"unparsed": 0, "unsupported": 0}
+        for rule, count in rule_counts.items():
+            if rule.error:
+                unusable["unsupported" if rule.source in UNSUPPORTED_RULES else "unparsed"] += count
+        self.unusable_rules = unusable
+
+        # "If match on All five Keys" tips are matched by key lookups, not by evaluate()
+        self.has_equipment_rules = any(type(rule) is EquipmentKeyRule for rule in rule_counts)
+        metrics.set_gauge("catalog_tips", len(tips))
+        for reason, count in unusable.items():
+            metrics.set_gauge("catalog_unusable_rules", count, reason=reason)
+
+    def __len__(self):
+        return len(self.tips)
+
+    @property
+    def categories(self):
+        return list(self._by_category)
+
+    def positions_for(self, category):
+        """Positions (indexes into ``tips``/``rules``) of a category's tips."""
+        return self._by_category.get(category, ())
+
+    def tips_for(self, category):
+        """Returns all tips in a category, regardless of profile."""
+        return [self.tips[position] for position in self.positions_for(category)]
+
+    @property
+    def equipment_index(self):
+        """EquipmentKeyIndex over the equipment-key tips, or None if the catalog has none."""
+        if self._equipment_index is None and self.has_equipment_rules:
+            with self._equipment_lock:
+                if self._equipment_index is None:
+                    rules = self.rules
+                    positions = [position for position, rule in enumerate(rules) if type(rule) is EquipmentKeyRule]
+                    self._equipment_index = EquipmentKeyIndex.build(
+                        self, positions, [rules[position].category for position in positions])
+        return self._equipment_index
+
+    def field_values(self, field):
+        """Yields one field of every tip, in catalog order (None where absent)."""
+        values = getattr(self.tips, "field_values", None)
+        if values is not None:
+            return values(field)  # MappedTips reads the column without decoding tips
+        return (tip.get(field) for tip in self.tips)
+
+    @property
+    def search_index(self):
+        """SearchIndex over this catalog's headlines and descriptions."""
+        if self._search_index is None:
+            with self._search_lock:  # One build, even if several threads search at once
+                if self._search_index is None:
+                    self._search_index = SearchIndex.build(self)
+        return self._search_index
+
+    def search(self, query, limit=10, allowed=None):
+        """(position, score) pairs of the best-matching tips; see SearchIndex.search."""
+        return self.search_index.search(query, limit, allowed)
+
+    @property
+    def query(self):
+        """TipQuery over this catalog's user_type and season partitions."""
+        if self._query is None:
+            self._query = TipQuery(self)
+        return self._query
+
+    def dependents(self, attributes):
+        """{category: positions} of the tips whose rule reads any of the profile ``attributes``.
+
+        Equipment-key tips depend on the ``Equipment`` attribute. Constant
+        rules (Always, unparsable) depend on nothing, so most of the catalog
+        never appears here.
+        """
+        if self._dependencies is None:
+            dependencies = {}
+            rules = self.rules
+            for category, positions in self._by_category.items():
+                for position in positions:
+                    rule = rules[position]
+                    attribute = EQUIPMENT_ATTRIBUTE if type(rule) is EquipmentKeyRule else rule.attribute
+                    if attribute is not None and rule.constant is None:
+                        dependencies.setdefault(attribute, {}).setdefault(category, []).append(position)
+            self._dependencies = dependencies
+        result = {}
+        for attribute in attributes:
+            for category, positions in self._dependencies.get(attribute, {}).items():
+                result.setdefault(category, []).extend(positions)
+        return result
+
+    def candidates(self, category, profile, season=None):
+        """Positions of the category's tips for the profile's user type and ``season``."""
+        return self.query.candidates(category, profile.get("user_type"), season)
+
+    def match_equipment(self, profile):
+        """{category: positions} of equipment-key tips matching the profile's equipment."""
+        if not self.has_equipment_rules:
+            return {}
+        return self.equipment_index.match(profile)
+
+    def _equipment_positions(self, category, profile, season, equipment_matches):
+        if equipment_matches is None:
+            equipment_matches = self.match_equipment(profile)
+        extra = equipment_matches.get(category)
+        if not extra:
+            return ()
+        return self.query.filter(extra, profile.get("user_type"), season)
+
+    def matching_positions(self, category, profile, equipment_matches=None, season=None):
+        """Positions of the category's tips that apply to the profile, in catalog order.
+
+        Rules are only evaluated for the tips the query planner lets through.
+        ``equipment_matches`` may pass in a precomputed match_equipment(profile).
+        """
+        rules = self.rules
+        positions = [position for position in self.candidates(category, profile, season)
+                     if rules[position].evaluate(profile)]
+        if self.has_equipment_rules:
+            extra = self._equipment_positions(category, profile, season, equipment_matches)
+            if extra:
+                positions = sorted(set(extra).union(positions))
+        return positions
+
+    def has_eligible_tip(self, category, profile, season=None):
+        """True if at least one tip in the category applies to the profile."""
+        rules = self.rules
+        candidates = self.candidates(category, profile, season)
+        metrics.inc("rules_short_circuited_total", len(self.positions_for(category)) - len(candidates))
+        evaluated = 0
+        for position in candidates:
+            evaluated += 1
+            if rules[position].evaluate(profile):
+                metrics.inc("rules_evaluated_total", evaluated)
+                return True
+        metrics.inc("rules_evaluated_total", evaluated)
+        if not self.has_equipment_rules:
+            return False
+        return bool(self._equipment_positions(category, profile, season, None))
+
+    def eligible_tips(self, category, profile, season=None):
+        """Returns the tips in a category whose rule applies to the profile."""
+        return [self.tips[position] for position in self.matching_positions(category, profile, season=season)]
@@ -0,0 +1,128 @@
+"""Command line interface.
+
+    smarttips recommend --custid-file ids.txt --out tips.jsonl
+    smarttips run --input custids.csv --out-dir results/ --workers 8
+
+Only the engine modules are imported, never Streamlit, so the CLI starts fast.
+"""
+import argparse
+import json
+import sys
+from itertools import islice
+
+
+def _read_custids(handle):
+    for line in handle:
+        custid = line.strip()
+        if custid:
+            yield custid
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def recommend(args):
+    from smarttips.engine import RecommendationEngine
+    from smarttips.profiles import ProfileProvider, SimulatedProfileBackend
+    from smarttips import metrics
+    from smarttips.materialized import RecommendationStore
+    from smarttips.query import current_season
+    from smarttips.store import load_compiled_catalog
+
+    if args.metrics_file:
+        metrics.enable()
+    engine = RecommendationEngine(
+        load_compiled_catalog(args.catalog),
+        ProfileProvider(SimulatedProfileBackend(latency=args.latency), max_connections=args.connections),
+        store=RecommendationStore(args.store) if args.store else None,
+    )
+    season = args.season or current_season()  # One season for the whole run
+    source = sys.stdin if args.custid_file == "-" else open(args.custid_file, 'r')
+    out = sys.stdout if args.out == "-" else open(args.out, 'w')
+    count = 0
+    try:
+        for chunk in _chunks(_read_custids(source), args.chunk_size):
+            for result in engine.recommend_many(chunk, season=season):
+                out.write(json.dumps(result) + "\n")
+                count += 1
+    finally:
+        engine.provider.close()
+        if engine.store is not None:
+            engine.store.close()
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    if args.metrics_file:
+        metrics.registry.write_prometheus(args.metrics_file)
+    print(f"Wrote recommendations for {count} customer(s).", file=sys.stderr)
+    return 0
+
+
+def run(args):
+    from smarttips import runner
+
+    def log(message):
+        print(message, file=sys.stderr)
+
+    summary = runner.run(
+        args.input, args.out_dir, args.catalog, workers=args.workers, shard_size=args.shard_size,
+        chunk_size=args.chunk_size, connections=args.connections, latency=args.latency,
+        restart=args.restart, store_path=args.store, season=args.season, log=log)
+    log(f"Processed {summary['written']} customer(s) for {summary['season']} in {summary['seconds']}s "
+        f"({summary['shards']} shard(s) done, {summary['skipped_shards']} resumed from checkpoint).")
+    return 0
+
+
+def build_parser():
+    from smarttips.query import SEASONS
+
+    parser = argparse.ArgumentParser(prog="smarttips", description="SmartTips recommendation engine")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rec = subparsers.add_parser("recommend", help="Recommend tips for a list of customer ids")
+    rec.add_argument("--custid-file", required=True, help="File with one custid per line ('-' for stdin)")
+    rec.add_argument("--out", default="-", help="Output JSONL file ('-' for stdout)")
+    rec.add_argument("--catalog", default="Xcel Tips - 250313.json", help="Tip catalog JSON file")
+    rec.add_argument("--chunk-size", type=int, default=500, help="Custids fetched per bulk profile request")
+    rec.add_argument("--connections", type=int, default=8, help="Concurrent profile fetches")
+    rec.add_argument("--latency", type=float, default=0.5, help="Simulated profile fetch latency in seconds")
+    rec.add_argument("--metrics-file", help="Write Prometheus text-format metrics to this file when done")
+    rec.add_argument("--store", help="SQLite results store to serve from and populate")
+    rec.add_argument("--season", choices=SEASONS, help="Season to recommend for (default: the current one)")
+    rec.set_defaults(func=recommend)
+
+    batch = subparsers.add_parser("run", help="Sharded, resumable multiprocess run over a large custid file")
+    batch.add_argument("--input", required=True, help="Custids as text (one per line), CSV or JSONL")
+    batch.add_argument("--out-dir", required=True, help="Directory for part-NNNNN.jsonl shards and the checkpoint")
+    batch.add_argument("--catalog", default="Xcel Tips - 250313.json", help="Tip catalog JSON file")
+    batch.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    batch.add_argument("--shard-size", type=int, default=10000, help="Custids per output shard")
+    batch.add_argument("--chunk-size", type=int, default=500, help="Custids fetched per bulk profile request")
+    batch.add_argument("--connections", type=int, default=8, help="Concurrent profile fetches per worker")
+    batch.add_argument("--latency", type=float, default=0.5, help="Simulated profile fetch latency in seconds")
+    batch.add_argument("--restart", action="store_true", help="Discard an existing checkpoint and start over")
+    batch.add_argument("--store", help="SQLite results store to serve from and populate")
+    batch.add_argument("--season", choices=SEASONS,
+                       help="Season to recommend for (default: the current one, pinned in the checkpoint)")
+    batch.set_defaults(func=run)
+    return parser
+
+
+def main(argv=None):
+    from smarttips.engine import CatalogError
+    from smarttips.runner import CheckpointError
+
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (CatalogError, CheckpointError, OSError) as e:
+        print(f"smarttips: error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,393 @@
+"""Headless recommendation engine.
+
+Everything needed to go from a custid to its eligible tip categories and tips,
+without importing Streamlit. The dashboard and the batch CLI are both thin
+clients of RecommendationEngine.
+"""
+from smarttips.catalog import (
+    CatalogError,
+    TipCatalog,
+    catalog_version,
+    load_tips,
+    parse_tips,
+    read_catalog_file,
+)
+from smarttips import metrics
+from smarttips.profiles import TTLCache, profile_fingerprint, profile_key
+from smarttips.query import current_season
+from smarttips.ranking import top_positions
+from smarttips.record import as_profile_record
+from smarttips.store import CatalogStore
+
+DEFAULT_CATALOG_PATH = "Xcel Tips - 250313.json"
+
+# Appliance categories and the profile field that says whether the appliance is present
+APPLIANCE_PRESENCE_KEYS = {
+    "Freezer": "Freezer",
+    "Dishwasher": "Dishwasher",
+    "Dryer": "Dryer",
+    "Washer": "Washer",
+    "Pool": "Pool",
+    "Hot Tub": "Hot Tub",
+    "Pool Heater": "Pool Heater",
+}
+
+
+def load_catalog(filepath=DEFAULT_CATALOG_PATH):
+    """Loads and compiles a catalog straight from its JSON file."""
+    raw = read_catalog_file(filepath)
+    return TipCatalog(parse_tips(raw, filepath), version=catalog_version(raw))
+
+
+def detect_potential_categories(profile):
+    """Returns the categories worth checking for a profile (General is always included)."""
+    potential_categories = {"General"}
+    for appliance, profile_key in APPLIANCE_PRESENCE_KEYS.items():
+        profile_value = profile.get(profile_key)
+        is_present = False
+        if isinstance(profile_value, str) and profile_value.lower() == "yes": is_present = True
+        elif isinstance(profile_value, (int, float)) and profile_value > 0: is_present = True
+        elif isinstance(profile_value, bool) and profile_value is True: is_present = True
+        if is_present: potential_categories.add(appliance)
+
+    # Add other potential non-appliance categories based on profile
+    if profile.get("Rate Plan") == "TOU": potential_categories.add("Rate Plan")
+    if profile.get("Insulation Pre 1992") is True: potential_categories.add("Insulation")
+    return potential_categories
+
+
+class EligibilityResult:
+    """Eligible tips of one profile against one catalog version.
+
+    ``tips_by_category`` maps each eligible category to the positions of its
+    eligible tips in the catalog the result was computed for.
+    """
+    __slots__ = ("catalog_version", "fingerprint", "season", "tips_by_category", "_positions")
+
+    def __init__(self, catalog_version, fingerprint, tips_by_category, season=None):
+        self.catalog_version = catalog_version
+        self.fingerprint = fingerprint
+        self.season = season
+        self.tips_by_category = tips_by_category
+        self._positions = None
+
+    @property
+    def positions(self):
+        """Set of all eligible tip positions, across categories."""
+        if self._positions is None:
+            self._positions = frozenset(
+                position for positions in self.tips_by_category.values() for position in positions)
+        return self._positions
+
+    @property
+    def categories(self):
+        return sorted(self.tips_by_category)
+
+    def tips(self, category, catalog):
+        """Eligible tips of a category; ``catalog`` must be the version the result is for."""
+        return [catalog.tips[position] for position in self.tips_by_category.get(category, ())]
+
+    def rowids(self, category, catalog):
+        return [tip.get("rowid") for tip in self.tips(category, catalog)]
+
+    def count(self, category):
+        return len(self.tips_by_category.get(category, ()))
+
+    def top_tips(self, category, catalog, user_type=None, limit=10, offset=0):
+        """One page of a category's eligible tips, most relevant first (see smarttips.ranking).
+
+        Only the tips on the page are read from the catalog.
+        """
+        positions = top_positions(catalog, self.tips_by_category.get(category, ()), user_type, self.season,
+                                  limit, offset)
+        return [catalog.tips[position] for position in positions]
+
+
+class EligibilityDelta:
+    """What a profile change added to and removed from a customer's eligibility.
+
+    ``added`` and ``removed`` map categories to catalog positions;
+    ``categories_added``/``categories_removed`` list categories that gained
+    their first or lost their last eligible tip. ``rules_evaluated`` is None
+    when the change needed a full evaluation.
+    """
+    __slots__ = ("before", "after", "added", "removed", "rules_evaluated")
+
+    def __init__(self, before, after, rules_evaluated):
+        self.before = before
+        self.after = after
+        self.rules_evaluated = rules_evaluated
+        self.added = {}
+        self.removed = {}
+        old, new = before.tips_by_category, after.tips_by_category
+        for category in old.keys() | new.keys():
+            old_positions, new_positions = set(old.get(category, ())), set(new.get(category, ()))
+            if new_positions - old_positions:
+                self.added[category] = sorted(new_positions - old_positions)
+            if old_positions - new_positions:
+                self.removed[category] = sorted(old_positions - new_positions)
+
+    def __bool__(self):
+        return bool(self.added or self.removed)
+
+    @property
+    def categories_added(self):
+        return sorted(set(self.after.tips_by_category) - set(self.before.tips_by_category))
+
+    @property
+    def categories_removed(self):
+        return sorted(set(self.before.tips_by_category) - set(self.after.tips_by_category))
+
+    def as_dict(self, catalog):
+        """JSON-friendly summary with tip rowids; ``catalog`` must be the version of ``after``."""
+        def rowids(changes):
+            return {category: [catalog.tips[position].get("rowid") for position in positions]
+                    for category, positions in changes.items()}
+        return {
+            "categories_added": self.categories_added,
+            "categories_removed": self.categories_removed,
+            "tips_added": rowids(self.added),
+            "tips_removed": rowids(self.removed),
+        }
+
+
+class RecommendationEngine:
+    """Resolves profiles to eligible tip categories and tips.
+
+    ``catalog`` is a TipCatalog or a CatalogStore; with a store every call
+    uses the store's current (hot-reloaded) catalog. Eligibility results are
+    memoized per (profile fingerprint, catalog version, season).
+
+    Only tips for the customer's user type are considered. With ``seasonal``
+    seasonal tips are limited to the current season unless a season is given.
+
+    The latest profile and result of each custid are kept in ``customers`` so
+    ``update()`` can patch them when a profile changes.
+
+    With a ``store`` (smarttips.materialized.RecommendationStore) results are
+    also served from and written to SQLite, behind the in-memory memo.
+    """
+
+    def __init__(self, catalog, provider=None, result_cache_size=4096, result_ttl=3600.0, seasonal=True,
+                 store=None):
+        self._catalog = catalog
+        self.provider = provider
+        self.seasonal = seasonal
+        self.store = store
+        self._store_version = None  # Catalog version the store was last purged for
+        self.results = TTLCache(maxsize=result_cache_size, ttl=result_ttl)
+        self.customers = TTLCache(maxsize=result_cache_size, ttl=result_ttl)  # custid -> (profile, result)
+
+    @property
+    def catalog(self):
+        if isinstance(self._catalog, CatalogStore):
+            return self._catalog.current()
+        return self._catalog
+
+    def _season(self, season):
+        if season is None and self.seasonal:
+            return current_season()
+        return season
+
+    def eligibility(self, profile, catalog=None, season=None):
+        """Returns the (memoized) EligibilityResult of a profile."""
+        if catalog is None:
+            catalog = self.catalog
+        result, evaluated = self._lookup(profile, catalog, season)
+        if evaluated:
+            self._persist([(profile.get("custid"), result)], catalog)
+        return result
+
+    def _lookup(self, profile, catalog, season):
+        """Returns (result, whether it was evaluated live rather than found in a cache)."""
+        season = self._season(season)
+        fingerprint = profile_fingerprint(profile)
+        # Catalogs without a version cannot be told apart, so never memoize them
+        key = (fingerprint, catalog.version, season) if catalog.version is not None else None
+        evaluated = False
+        result = self.results.get(key) if key else None
+        if result is not None:
+            metrics.inc("cache_requests_total", cache="eligibility", result="hit")
+        else:
+            metrics.inc("cache_requests_total", cache="eligibility", result="miss")
+            result = self._from_store(profile.get("custid"), fingerprint, catalog, season) if key else None
+            if result is None:
+                result = self._evaluate(profile, catalog, fingerprint, season)
+                evaluated = True
+            if key:
+                self.results.set(key, result)
+        self._remember(profile, result)
+        return result, evaluated
+
+    def _from_store(self, custid, fingerprint, catalog, season):
+        if self.store is None or custid is None:
+            return None
+        if self._store_version != catalog.version:
+            self._store_version = catalog.version
+            self.store.purge(catalog.version)
+        result = self.store.get(profile_key(custid), fingerprint, catalog.version, season)
+        metrics.inc("cache_requests_total", cache="store", result="miss" if result is None else "hit")
+        return result
+
+    def _persist(self, items, catalog):
+        if self.store is not None:
+            self.store.put_many([(profile_key(custid), result) for custid, result in items if custid is not None],
+                                catalog)
+
+    def _remember(self, profile, result):
+        custid = profile.get("custid")
+        if custid is not None:
+            self.customers.set(profile_key(custid), (profile, result))
+
+    def _evaluate(self, profile, catalog, fingerprint, season):
+        with metrics.timer("stage_seconds", stage="category_detection"):
+            potential_categories = detect_potential_categories(profile)
+        tips_by_category = {}
+        evaluated = short_circuited = 0
+        with metrics.timer("stage_seconds", stage="verification"):
+            equipment_matches = catalog.match_equipment(profile)
+            for category in potential_categories:
+                candidates = catalog.candidates(category, profile, season)
+                positions = catalog.matching_positions(category, profile, equipment_matches, season)
+                evaluated += len(candidates)
+                short_circuited += len(catalog.positions_for(category)) - len(candidates)
+                if positions:
+                    tips_by_category[category] = positions
+        metrics.inc("rules_evaluated_total", evaluated)
+        metrics.inc("rules_short_circuited_total", short_circuited)
+        return EligibilityResult(catalog.version, fingerprint, tips_by_category, season)
+
+    def update(self, custid, changed_fields, catalog=None, season=None):
+        """Applies a profile delta and patches the customer's eligibility; returns an EligibilityDelta.
+
+        ``changed_fields`` maps profile fields to their new values. Only the
+        rules that read a changed field are re-evaluated (plus whole
+        categories the change makes worth checking), so the cost follows the
+        size of the change, not of the catalog. A changed user type, season
+        or catalog version falls back to a full evaluation.
+        """
+        if catalog is None:
+            catalog = self.catalog
+        season = self._season(season)
+        state = self.customers.get(profile_key(custid))
+        if state is None:
+            if self.provider is None:
+                raise KeyError(f"No stored eligibility for custid {custid!r}")
+            profile = self.provider.get_profile(custid)
+            state = (profile, self.eligibility(profile, catalog, season))
+        old_profile, before = state
+        profile = as_profile_record(old_profile).replace(changed_fields)
+        changed = {field for field, value in changed_fields.items() if old_profile.get(field) != value}
+
+        fingerprint = profile_fingerprint(profile)
+        if "user_type" in changed or before.catalog_version != catalog.version or before.season != season:
+            after = self._evaluate(profile, catalog, fingerprint, season)
+            evaluated = None
+        else:
+            after, evaluated = self._patch(before, old_profile, profile, changed, catalog, fingerprint, season)
+        if catalog.version is not None:
+            self.results.set((fingerprint, catalog.version, season), after)
+        self._remember(profile, after)
+        self._persist([(custid, after)], catalog)
+        if self.provider is not None:
+            self.provider.cache.set(profile_key(custid), profile)
+        return EligibilityDelta(before, after, evaluated)
+
+    def _patch(self, before, old_profile, profile, changed, catalog, fingerprint, season):
+        """Re-evaluates only the tips depending on ``changed``; returns (result, rules evaluated)."""
+        rules = catalog.rules
+        tips_by_category = {category: list(positions) for category, positions in before.tips_by_category.items()}
+        old_categories = detect_potential_categories(old_profile)
+        new_categories = detect_potential_categories(profile)
+        equipment_matches = catalog.match_equipment(profile) if catalog.has_equipment_rules else {}
+        evaluated = short_circuited = 0
+        for category in old_categories - new_categories:
+            tips_by_category.pop(category, None)
+        for category in new_categories - old_categories:
+            candidates = catalog.candidates(category, profile, season)
+            evaluated += len(candidates)
+            short_circuited += len(catalog.positions_for(category)) - len(candidates)
+            positions = catalog.matching_positions(category, profile, equipment_matches, season)
+            if positions:
+                tips_by_category[category] = positions
+        user_type = profile.get("user_type")
+        for category, affected in catalog.dependents(changed).items():
+            if category not in new_categories or category not in old_categories:
+                continue
+            eligible = set(tips_by_category.get(category, ()))
+            matched = equipment_matches.get(category, ())
+            kept = catalog.query.filter(affected, user_type, season)
+            short_circuited += len(affected) - len(kept)
+            for position in kept:
+                evaluated += 1
+                if rules[position].evaluate(profile) or position in matched:
+                    eligible.add(position)
+                else:
+                    eligible.discard(position)
+            if eligible:
+                tips_by_category[category] = sorted(eligible)
+            else:
+                tips_by_category.pop(category, None)
+        metrics.inc("rules_evaluated_total", evaluated)
+        metrics.inc("rules_short_circuited_total", short_circuited)
+        return EligibilityResult(catalog.version, fingerprint, tips_by_category, season), evaluated
+
+    def search(self, query, profile=None, catalog=None, limit=10, season=None):
+        """Free-text search over tip headlines and descriptions; returns [(tip, score)], best first.
+
+        With a ``profile`` only the customer's eligible tips are searched.
+        """
+        if catalog is None:
+            catalog = self.catalog
+        allowed = self.eligibility(profile, catalog, season).positions if profile is not None else None
+        with metrics.timer("stage_seconds", stage="search"):
+            hits = catalog.search(query, limit, allowed)
+        return [(catalog.tips[position], score) for position, score in hits]
+
+    def eligible_categories(self, profile, catalog=None, season=None):
+        """Sorted categories that have at least one tip applying to the profile."""
+        return self.eligibility(profile, catalog, season).categories
+
+    def tips_for(self, category, profile, catalog=None, season=None):
+        if catalog is None:
+            catalog = self.catalog
+        return catalog.eligible_tips(category, profile, self._season(season))
+
+    def recommend_profile(self, profile, catalog=None, season=None):
+        """Returns {"custid", "catalog_version", "season", "categories", "tips": {category: [rowid, ...]}}."""
+        if catalog is None:
+            catalog = self.catalog  # One consistent catalog for the whole recommendation
+        return self._recommendation(profile, self.eligibility(profile, catalog, season), catalog)
+
+    @staticmethod
+    def _recommendation(profile, result, catalog):
+        return {
+            "custid": profile.get("custid"),
+            "catalog_version": catalog.version,
+            "season": result.season,
+            "categories": result.categories,
+            "tips": {category: result.rowids(category, catalog) for category in result.categories},
+        }
+
+    def recommend(self, custid, season=None):
+        return self.recommend_profile(self.provider.get_profile(custid), season=season)
+
+    def recommend_many(self, custids, season=None):
+        """Yields one recommendation per custid, in input order, fetching profiles in bulk.
+
+        Repeated custids are fetched once but still get one recommendation
+        each. Batch jobs should pass ``season`` explicitly so that a long
+        run does not change seasons halfway through. Newly evaluated results
+        are written to the store in one bulk upsert.
+        """
+        catalog = self.catalog
+        custids = list(custids)
+        profiles = self.provider.get_profiles(custids)
+        evaluated = []
+        for custid in custids:
+            profile = profiles[profile_key(custid)]
+            result, was_evaluated = self._lookup(profile, catalog, season)
+            if was_evaluated:
+                evaluated.append((profile.get("custid"), result))
+            yield self._recommendation(profile, result, catalog)
+        self._persist(evaluated, catalog)
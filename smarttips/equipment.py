@@ -0,0 +1,113 @@
+"""Equipment-key matching for ``If match on All five Keys`` tips.
+
+Those tips apply to customers owning a specific piece of equipment, identified
+by the tip's key fields: ``user_type``, ``fuel``, ``sub_id1`` and ``sub_id2``.
+The catalog data is dirty (``fuel`` holds ``"E"``, ``"Electric"`` and
+``"Electric "``), so every component is normalized when the index is built,
+and an empty component is a wildcard.
+
+EquipmentKeyIndex hashes each tip under its normalized key tuple, with ``None``
+for wildcard components. Matching a customer's equipment item then probes one
+key per wildcard pattern that actually occurs in the catalog, which is a
+handful of dict lookups regardless of catalog size.
+"""
+from itertools import product
+
+EQUIPMENT_KEY_FIELDS = ("user_type", "fuel", "sub_id1", "sub_id2")
+# Profile attribute holding the customer's equipment records
+EQUIPMENT_ATTRIBUTE = "Equipment"
+
+# Normalized spellings that mean the same thing
+_ALIASES = {
+    "fuel": {"e": "electric", "elec": "electric", "electricity": "electric",
+             "natural gas": "gas", "ng": "gas", "lp": "propane"},
+}
+USER_TYPES = ("residential", "commercial")
+# Combined tip/customer user types and the concrete user types they cover
+USER_TYPE_EXPANSION = {
+    "res&com": USER_TYPES,
+}
+
+
+def normalize_text(value):
+    """Collapses whitespace and casefolds a catalog/profile value; None becomes ""."""
+    return " ".join(str(value).split()).casefold() if value is not None else ""
+
+
+def normalize_component(field, value):
+    """Normalizes one key component; empty values become None (wildcard)."""
+    text = normalize_text(value)
+    if not text:
+        return None
+    return _ALIASES.get(field, {}).get(text, text)
+
+
+def _user_types(value):
+    user_type = normalize_component("user_type", value)
+    if user_type is None:
+        return (None,)
+    return USER_TYPE_EXPANSION.get(user_type, (user_type,))
+
+
+def tip_keys(tip):
+    """Normalized key tuples a tip is indexed under (one per covered user type)."""
+    return _keys([tip.get(field) for field in EQUIPMENT_KEY_FIELDS])
+
+
+def _keys(values):
+    # ``values`` are a tip's raw EQUIPMENT_KEY_FIELDS, in that order
+    equipment = tuple(normalize_component(field, value)
+                      for field, value in zip(EQUIPMENT_KEY_FIELDS[1:], values[1:]))
+    return [(user_type,) + equipment for user_type in _user_types(values[0])]
+
+
+class EquipmentKeyIndex:
+    """Hash index from normalized (user_type, fuel, sub_id1, sub_id2) to tip positions."""
+
+    def __init__(self):
+        self._index = {}     # key tuple (None = wildcard) -> [(position, category), ...]
+        self._patterns = []  # wildcard patterns present: tuples of bools, True = wildcard
+
+    @classmethod
+    def build(cls, catalog, positions, categories):
+        """Indexes the catalog's tips at ``positions``; ``categories`` aligns with positions.
+
+        Key fields are read with ``catalog.field_values``, so a memory-mapped
+        catalog does not decode the tips themselves.
+        """
+        index = cls()
+        patterns = set()
+        wanted = dict(zip(positions, categories))
+        columns = zip(*(catalog.field_values(field) for field in EQUIPMENT_KEY_FIELDS))
+        for position, values in enumerate(columns):
+            category = wanted.get(position)
+            if category is None:
+                continue
+            for key in _keys(values):
+                index._index.setdefault(key, []).append((position, category))
+                patterns.add(tuple(component is None for component in key))
+        index._patterns = sorted(patterns)
+        return index
+
+    def __len__(self):
+        return len(self._index)
+
+    def match(self, profile):
+        """Returns {category: set of positions} of tips matching the profile's equipment."""
+        equipment = profile.get(EQUIPMENT_ATTRIBUTE) or ()
+        if not equipment or not self._index:
+            return {}
+        user_types = _user_types(profile.get("user_type"))
+        matches = {}
+        seen = set()
+        for item in equipment:
+            components = tuple(normalize_component(field, item.get(field)) for field in EQUIPMENT_KEY_FIELDS[1:])
+            for user_type, pattern in product(user_types, self._patterns):
+                key = tuple(None if wildcard else value
+                            for wildcard, value in zip(pattern, (user_type,) + components))
+                if key in seen:
+                    continue
+                seen.add(key)
+                for position, category in self._index.get(key, ()):
+                    matches.setdefault(category, set()).add(position)
+        return matches
@@ -0,0 +1,146 @@
+"""Materialized per-customer recommendations in SQLite.
+
+Each customer has at most one row: its eligible categories, tip rowids and
+tip positions, together with the profile fingerprint, catalog version and
+season they were computed for. A lookup only hits when all three still
+match, so a changed profile or a reloaded catalog makes the row a miss and
+the fresh result overwrites it; ``purge()`` drops rows of old catalog
+versions in bulk.
+
+Rows are written lazily by RecommendationEngine on the first live
+evaluation, or in bulk (one transaction per chunk) by batch runs.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from smarttips.engine import EligibilityResult
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recommendations (
+    custid          TEXT PRIMARY KEY,
+    fingerprint     TEXT NOT NULL,
+    catalog_version TEXT NOT NULL,
+    season          TEXT NOT NULL,
+    categories      TEXT NOT NULL,
+    tips            TEXT NOT NULL,
+    positions       TEXT NOT NULL,
+    updated_at      REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS recommendations_catalog_version ON recommendations (catalog_version);
+"""
+_UPSERT = """
+INSERT INTO recommendations (custid, fingerprint, catalog_version, season, categories, tips, positions, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (custid) DO UPDATE SET
+    fingerprint = excluded.fingerprint,
+    catalog_version = excluded.catalog_version,
+    season = excluded.season,
+    categories = excluded.categories,
+    tips = excluded.tips,
+    positions = excluded.positions,
+    updated_at = excluded.updated_at
+"""
+
+
+class RecommendationStore:
+    """SQLite-backed store of EligibilityResults keyed by custid.
+
+    One connection is shared by all threads behind a lock; separate
+    processes (batch workers) each open their own store on the same file.
+    """
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")  # Readers do not block the writer
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM recommendations").fetchone()[0]
+
+    def get(self, custid, fingerprint, catalog_version, season=None):
+        """Returns the stored EligibilityResult if it is still current, else None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT positions FROM recommendations "
+                "WHERE custid = ? AND fingerprint = ? AND catalog_version = ? AND season = ?",
+                (custid, fingerprint, catalog_version, season or ""),
+            ).fetchone()
+        if row is None:
+            return None
+        return EligibilityResult(catalog_version, fingerprint, json.loads(row[0]), season)
+
+    def get_row(self, custid):
+        """The stored row of a custid as a dict (whatever its version), or None."""
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM recommendations WHERE custid = ?", (custid,))
+            row = cursor.fetchone()
+            names = [column[0] for column in cursor.description]
+        if row is None:
+            return None
+        row = dict(zip(names, row))
+        for field in ("categories", "tips", "positions"):
+            row[field] = json.loads(row[field])
+        row["season"] = row["season"] or None
+        return row
+
+    def _row(self, custid, result, catalog, now):
+        tips_by_category = {category: list(positions) for category, positions in result.tips_by_category.items()}
+        return (
+            custid,
+            result.fingerprint,
+            result.catalog_version,
+            result.season or "",
+            json.dumps(result.categories),
+            json.dumps({category: result.rowids(category, catalog) for category in result.categories}),
+            json.dumps(tips_by_category),
+            now,
+        )
+
+    def put(self, custid, result, catalog):
+        """Upserts one customer's result; ``catalog`` is the version it was computed for."""
+        self.put_many([(custid, result)], catalog)
+
+    def put_many(self, items, catalog):
+        """Upserts many (custid, result) pairs in one transaction."""
+        now = time.time()
+        rows = [self._row(custid, result, catalog, now) for custid, result in items
+                if custid is not None and result.catalog_version is not None]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(_UPSERT, rows)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def invalidate(self, custid):
+        with self._lock:
+            self._conn.execute("DELETE FROM recommendations WHERE custid = ?", (custid,))
+
+    def purge(self, current_version):
+        """Deletes rows computed for any other catalog version; returns how many."""
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM recommendations WHERE catalog_version != ?", (current_version,)).rowcount
+        if deleted:
+            logger.info("Purged %d stored recommendation(s) of old catalog versions", deleted)
+        return deleted
@@ -0,0 +1,279 @@
+"""Lightweight in-process metrics: counters, gauges and latency histograms.
+
+Metrics are off unless ``SMARTTIPS_METRICS=1`` is set or ``enable()`` is
+called. While disabled every recording call returns after a single attribute
+check and ``timer()`` hands back a shared no-op context manager, so the
+instrumentation can stay on the hot path.
+
+Everything recorded goes to the process-wide ``registry``. Code running inside
+``with session_metrics(other_registry):`` additionally records into
+``other_registry``, which the app uses for its per-session debug panel.
+
+The registry can be rendered in the Prometheus text format, written to a
+file, or served over HTTP with ``start_http_server(port)``.
+"""
+import contextlib
+import contextvars
+import os
+import tempfile
+import threading
+import time
+
+PREFIX = "smarttips_"
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help)
+METRICS = {
+    "request_seconds": ("histogram", "End-to-end time to serve one customer lookup."),
+    "stage_seconds": ("histogram", "Time spent in each stage of a customer lookup."),
+    "rules_evaluated_total": ("counter", "Compiled rules evaluated against a profile."),
+    "rules_short_circuited_total": ("counter",
+                                    "Tips skipped by the user type/season planner without evaluating their rule."),
+    "catalog_unusable_rules": ("gauge", "Tips in the current catalog whose rule can never match."),
+    "catalog_tips": ("gauge", "Tips in the current catalog."),
+    "catalog_reloads_total": ("counter", "Catalog versions loaded by a CatalogStore."),
+    "cache_requests_total": ("counter", "Cache lookups by cache and result (hit/miss/coalesced)."),
+    "errors_total": ("counter", "Errors while serving a customer lookup, by stage."),
+}
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q):
+        """Upper bucket bound below which a fraction ``q`` of observations fall."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    """Thread-safe store of counters, gauges and histograms."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+        """Plain-dict view: {"counters", "gauges", "histograms"} keyed by "name{labels}"."""
+        with self._lock:
+            return {
+                "counters": {_format_key(key): value for key, value in sorted(self._counters.items())},
+                "gauges": {_format_key(key): value for key, value in sorted(self._gauges.items())},
+                "histograms": {
+                    _format_key(key): {
+                        "count": histogram.count,
+                        "mean_ms": round(histogram.sum / histogram.count * 1000, 3) if histogram.count else None,
+                        "p50_ms": _bound_ms(histogram.quantile(0.5)),
+                        "p95_ms": _bound_ms(histogram.quantile(0.95)),
+                    }
+                    for key, histogram in sorted(self._histograms.items())
+                },
+            }
+
+    def to_prometheus(self):
+        """Renders all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            by_name = {}
+            for store in (self._counters, self._gauges, self._histograms):
+                for key, value in store.items():
+                    by_name.setdefault(key[0], []).append((key[1], value))
+            for name in sorted(by_name):
+                kind, help_text = METRICS.get(name, ("untyped", name))
+                full_name = PREFIX + name
+                lines.append(f"# HELP {full_name} {help_text}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                for labels, value in sorted(by_name[name], key=lambda item: item[0]):
+                    if isinstance(value, Histogram):
+                        cumulative = 0
+                        for bound, count in zip(value.buckets, value.counts):
+                            cumulative += count
+                            lines.append(f"{full_name}_bucket{_labels(labels + (('le', repr(bound)),))} {cumulative}")
+                        lines.append(f"{full_name}_bucket{_labels(labels + (('le', '+Inf'),))} {value.count}")
+                        lines.append(f"{full_name}_sum{_labels(labels)} {value.sum}")
+                        lines.append(f"{full_name}_count{_labels(labels)} {value.count}")
+                    else:
+                        lines.append(f"{full_name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Writes the Prometheus text file atomically (for node_exporter's textfile collector)."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_key(key):
+    name, labels = key
+    return name + (_labels(labels) if labels else "")
+
+
+def _bound_ms(bound):
+    return None if bound is None else bound * 1000
+
+
+# --- Process-wide registry and recording helpers ---
+registry = MetricsRegistry(enabled=os.environ.get("SMARTTIPS_METRICS", "") == "1")
+_session = contextvars.ContextVar("smarttips_session_metrics", default=None)
+
+
+def enable(enabled=True):
+    registry.enabled = enabled
+
+
+def is_enabled():
+    return registry.enabled
+
+
+def inc(name, amount=1, **labels):
+    if not registry.enabled:
+        return
+    registry.inc(name, amount, **labels)
+    session = _session.get()
+    if session is not None:
+        session.inc(name, amount, **labels)
+
+
+def set_gauge(name, value, **labels):
+    if not registry.enabled:
+        return
+    registry.set_gauge(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    if not registry.enabled:
+        return
+    registry.observe(name, value, **labels)
+    session = _session.get()
+    if session is not None:
+        session.observe(name, value, **labels)
+
+
+class _Timer:
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def timer(name, **labels):
+    """Context manager observing the elapsed seconds into histogram ``name``."""
+    if not registry.enabled:
+        return _NULL_TIMER
+    return _Timer(name, labels)
+
+
+def current_session():
+    """The session registry bound in the current context, if any."""
+    return _session.get()
+
+
+@contextlib.contextmanager
+def session_metrics(session_registry):
+    """Also records everything inside the block into ``session_registry``."""
+    token = _session.set(session_registry)
+    try:
+        yield session_registry
+    finally:
+        _session.reset(token)
+
+
+def start_http_server(port, addr=""):
+    """Serves ``/metrics`` from a daemon thread; returns the server."""
+    # Imported here: http.server pulls in http.client and email, which only the dashboard needs
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Keep scrapes out of the app's stderr
+
+    server = ThreadingHTTPServer((addr, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
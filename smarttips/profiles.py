@@ -0,0 +1,304 @@
+"""Customer profile providers.
+
+A ProfileProvider sits in front of a profile backend (the NILM database/API in
+production, SimulatedProfileBackend offline) and adds:
+
+* a bounded connection pool, so at most ``max_connections`` fetches run at once;
+* a TTL + LRU cache keyed by the normalized custid;
+* request coalescing, so concurrent callers asking for the same custid share
+  one in-flight fetch;
+* a bulk ``get_profiles(custids)`` call.
+
+Fetches run on a private asyncio event loop in a background thread, which lets
+synchronous callers (the Streamlit script thread, batch jobs) share the pool,
+cache and in-flight requests.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from smarttips import metrics
+from smarttips.record import ProfileRecord, as_profile_record
+
+
+def profile_key(custid):
+    """Normalized cache key for a customer id."""
+    return str(custid).strip()
+
+
+def profile_fingerprint(profile):
+    """Short hash of a profile's contents; changes whenever any attribute changes."""
+    if isinstance(profile, ProfileRecord):
+        profile = profile.to_dict()
+    encoded = json.dumps(profile, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def stable_seed(custid):
+    """Seed derived from the custid that is identical in every process.
+
+    ``hash()`` of a str is randomized per process, so it cannot be used to
+    make simulated profiles agree between workers.
+    """
+    digest = hashlib.sha256(profile_key(custid).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize=1024, ttl=300.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return default if entry is None else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+async def _in_session(coro, session):
+    with metrics.session_metrics(session):
+        return await coro
+
+
+# (fuel, sub_id1, sub_id2) equipment records the NILM simulation can detect
+SIMULATED_EQUIPMENT = (
+    ("Gas", "Central/Forced Air", "Furnace"),
+    ("Propane", "Central/Forced Air", "Furnace"),
+    ("Electric", "Central/Forced Air", "Central A/C"),
+    ("Gas", "Distributed Heaters", "Fireplace"),
+    ("Electric", "Distributed Cooling", "AC Unit"),
+    ("Electric", "Distributed Cooling", "Swamp Cooler"),
+    ("Electric", "Heat", "Heat Pump"),
+    ("Electric", "Tank", "Water Heating"),
+)
+
+
+class SimulatedProfileBackend:
+    """Offline stand-in for the NILM profile database/API."""
+
+    def __init__(self, latency=0.5):
+        self.latency = latency  # Simulated network delay per request
+
+    async def fetch(self, custid):
+        await asyncio.sleep(self.latency)
+        return self.build_profile(custid)
+
+    async def fetch_many(self, custids):
+        # One simulated round trip for the whole batch
+        await asyncio.sleep(self.latency)
+        return {custid: self.build_profile(custid) for custid in custids}
+
+    @staticmethod
+    def build_profile(custid):
+        """Simulates a customer profile record; the same custid always gives the same profile."""
+        rng = random.Random(stable_seed(custid))
+        return ProfileRecord.from_dict({
+            "custid": custid,
+            "user_type": rng.choice(["residential", "commercial", "res&com"]),
+            "Freezer": rng.choice(["Yes", "No"]),
+            "Dishwasher": rng.choice(["Yes", "No"]),
+            "Dryer": rng.choice(["Yes", "No"]),
+            "Washer": rng.choice(["Yes", "No"]),
+            "Pool": rng.choice(["Yes", "No"]),
+            "Hot Tub": rng.choice(["Yes", "No"]),
+            "Pool Heater": rng.randint(0, 6) if rng.choice([True, False]) else 0,  # Months
+            "Rate Plan": rng.choice(["TOU", "Standard", "EV Rate"]),
+            "Insulation Pre 1992": rng.choice([True, False]),
+            "Programmable Thermostat": rng.choice(["Yes", "No"]),
+            "CFLs": rng.choice(["All", "Some", "None"]),
+            "Cool": rng.choice(["Yes", "No"]),
+            "Water Heater Electric": rng.choice(["Yes", "No"]),
+            "Ducts": rng.choice(["No Ducts", "Standard Ducts", "Leaky Ducts"]),
+            # Matched by "If match on All five Keys" tips
+            "Equipment": [dict(zip(("fuel", "sub_id1", "sub_id2"), item))
+                          for item in rng.sample(SIMULATED_EQUIPMENT, rng.randint(0, 2))],
+        })
+
+
+class ProfileProvider:
+    """Pooled, cached and coalescing front end for a profile backend.
+
+    Profiles returned from the cache are shared between callers and must be
+    treated as read-only.
+    """
+
+    def __init__(self, backend, max_connections=8, cache_size=10000, ttl=300.0, bulk_chunk_size=100):
+        self.backend = backend
+        self.max_connections = max_connections
+        self.bulk_chunk_size = bulk_chunk_size
+        self.cache = TTLCache(maxsize=cache_size, ttl=ttl)
+        self._in_flight = {}  # key -> asyncio.Future, only touched on the loop thread
+        self._pool = None
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    # --- Event loop management ---
+    def _ensure_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="profile-provider", daemon=True)
+                thread.start()
+                self._loop = loop
+            return self._loop
+
+    def _run(self, coro):
+        session = metrics.current_session()
+        if session is not None:
+            # Tasks on the loop thread don't inherit the caller's context
+            coro = _in_session(coro, session)
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    def close(self):
+        """Stops the background event loop."""
+        with self._loop_lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
+                self._pool = None
+
+    # --- Async API (runs on the provider's loop) ---
+    async def _backend_call(self, coro_fn, *args):
+        if self._pool is None:
+            self._pool = asyncio.Semaphore(self.max_connections)
+        async with self._pool:
+            return await coro_fn(*args)
+
+    async def fetch_profile(self, custid):
+        key = profile_key(custid)
+        profile = self.cache.get(key)
+        if profile is not None:
+            metrics.inc("cache_requests_total", cache="profile", result="hit")
+            return profile
+        future = self._in_flight.get(key)
+        if future is not None:
+            metrics.inc("cache_requests_total", cache="profile", result="coalesced")
+            return await asyncio.shield(future)
+        metrics.inc("cache_requests_total", cache="profile", result="miss")
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            profile = as_profile_record(await self._backend_call(self.backend.fetch, key))
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # Mark retrieved in case nobody else was waiting
+            raise
+        else:
+            self.cache.set(key, profile)
+            future.set_result(profile)
+            return profile
+        finally:
+            self._release(key, future)
+
+    def _release(self, key, future):
+        # Only drop our own entry; a later fetch may have registered a new one
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+
+    async def fetch_profiles(self, custids):
+        """Returns {custid: profile}, fetching cache misses in bulk chunks."""
+        keys = list(dict.fromkeys(profile_key(custid) for custid in custids))
+        results = {}
+        missing = []
+        waiting = {}
+        for key in keys:
+            profile = self.cache.get(key)
+            if profile is not None:
+                results[key] = profile
+            elif key in self._in_flight:
+                waiting[key] = self._in_flight[key]
+            else:
+                missing.append(key)
+        metrics.inc("cache_requests_total", len(results), cache="profile", result="hit")
+        metrics.inc("cache_requests_total", len(waiting), cache="profile", result="coalesced")
+
+        fetch_many = getattr(self.backend, "fetch_many", None)
+        if fetch_many is None:
+            fetched = await asyncio.gather(*(self.fetch_profile(key) for key in missing))
+            results.update(zip(missing, fetched))
+        else:
+            metrics.inc("cache_requests_total", len(missing), cache="profile", result="miss")
+            # Registered before the first await, so overlapping fetches of the same keys coalesce onto these
+            loop = asyncio.get_running_loop()
+            futures = {}
+            for key in missing:
+                futures[key] = self._in_flight[key] = loop.create_future()
+            chunks = [missing[i:i + self.bulk_chunk_size] for i in range(0, len(missing), self.bulk_chunk_size)]
+            for chunk_result in await asyncio.gather(*(self._fetch_chunk(chunk, futures) for chunk in chunks)):
+                results.update(chunk_result)
+
+        for key, future in waiting.items():
+            results[key] = await asyncio.shield(future)
+        return {key: results[key] for key in keys}
+
+    async def _fetch_chunk(self, keys, futures):
+        """Fetches ``keys`` in one backend call and resolves their ``futures`` (already in flight)."""
+        try:
+            profiles = await self._backend_call(self.backend.fetch_many, keys)
+            profiles = {key: as_profile_record(profiles[key]) for key in keys}
+            for key in keys:
+                self.cache.set(key, profiles[key])
+                futures[key].set_result(profiles[key])
+            return profiles
+        except BaseException as exc:
+            for key in keys:
+                future = futures[key]
+                if not future.done():
+                    future.set_exception(exc)
+                    future.exception()
+            raise
+        finally:
+            for key in keys:
+                self._release(key, futures[key])
+
+    # --- Sync API ---
+    def get_profile(self, custid):
+        """Returns the profile for one custid, blocking until it is available."""
+        profile = self.cache.get(profile_key(custid))
+        if profile is not None:
+            metrics.inc("cache_requests_total", cache="profile", result="hit")
+            return profile
+        return self._run(self.fetch_profile(custid))
+
+    def get_profiles(self, custids):
+        """Returns {custid: profile} for many custids with pooled bulk fetches."""
+        return self._run(self.fetch_profiles(custids))
+
+    def invalidate(self, custid):
+        self.cache.pop(profile_key(custid))
@@ -0,0 +1,194 @@
+"""Query planner over a TipCatalog's user_type and season partitions.
+
+Every tip carries a ``user_type`` (residential, commercial or res&com) and a
+``category`` that is either ``general-tip`` or ``seasonal-<season>``. Instead
+of checking those per tip, TipQuery partitions the catalog once: for each
+customer user type and each season it keeps the positions of the tips that
+apply (as a sorted array) and a byte mask for O(1) membership tests.
+
+A query names a rule category plus any of the filters. The planner orders the
+partitions involved by size, walks the smallest one and keeps the positions
+that are in every other mask, stopping as soon as nothing is left. Only the
+surviving tips have their profile rules evaluated (see
+``TipCatalog.matching_positions``). Results are cached per filter
+combination, of which there are only a few dozen.
+
+TipQuery also keeps each tip's own season and user type as one byte per tip
+(``season_codes``/``user_type_codes``: 0 for year-round or both user types,
+else the 1-based index into SEASONS/USER_TYPES) for smarttips.ranking.
+"""
+import datetime
+import threading
+from array import array
+from collections import OrderedDict
+
+from smarttips.equipment import USER_TYPE_EXPANSION, USER_TYPES, normalize_text
+
+SEASONS = ("winter", "spring", "summer", "fall")
+_SEASONAL_PREFIX = "seasonal-"
+# Meteorological seasons by month
+_SEASON_BY_MONTH = {12: "winter", 1: "winter", 2: "winter", 3: "spring", 4: "spring", 5: "spring",
+                    6: "summer", 7: "summer", 8: "summer", 9: "fall", 10: "fall", 11: "fall"}
+
+
+def current_season(today=None):
+    """The season (winter/spring/summer/fall) of ``today`` (default: the local date)."""
+    today = today or datetime.date.today()
+    return _SEASON_BY_MONTH[today.month]
+
+
+def season_code(value):
+    """1-based index of a season in SEASONS (the codes in TipQuery.season_codes), or -1."""
+    value = normalize_text(value)
+    return SEASONS.index(value) + 1 if value in SEASONS else -1
+
+
+def user_type_code(value):
+    """1-based index of a user type in USER_TYPES (as in TipQuery.user_type_codes), or -1."""
+    value = normalize_text(value)
+    return USER_TYPES.index(value) + 1 if value in USER_TYPES else -1
+
+
+def tip_user_types(value):
+    """Customer user types a tip's ``user_type`` applies to; empty/unknown values apply to all."""
+    user_type = normalize_text(value)
+    if user_type in USER_TYPES:
+        return (user_type,)
+    return USER_TYPE_EXPANSION.get(user_type, USER_TYPES)
+
+
+def customer_user_types(value):
+    """Tip user types a customer matches (res&com: both); None for an unknown user type."""
+    user_type = normalize_text(value)
+    if not user_type:
+        return USER_TYPES
+    if user_type in USER_TYPES:
+        return (user_type,)
+    return USER_TYPE_EXPANSION.get(user_type)
+
+
+def tip_seasons(value):
+    """Seasons a tip's ``category`` applies to; anything not seasonal applies year-round."""
+    category = normalize_text(value)
+    if category.startswith(_SEASONAL_PREFIX) and category[len(_SEASONAL_PREFIX):] in SEASONS:
+        return (category[len(_SEASONAL_PREFIX):],)
+    return SEASONS
+
+
+class Partition:
+    """Tip positions sharing a filter value: sorted positions plus a membership mask."""
+    __slots__ = ("name", "positions", "mask")
+
+    def __init__(self, name, positions, size):
+        self.name = name
+        self.positions = positions
+        self.mask = bytearray(size)
+        for position in positions:
+            self.mask[position] = 1
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __repr__(self):
+        return f"Partition({self.name}, {len(self)} tips)"
+
+
+class TipQuery:
+    """Prebuilt user_type and season partitions of a catalog, with a small planner."""
+
+    def __init__(self, catalog, cache_size=128):
+        self.catalog = catalog
+        size = len(catalog)
+        self.size = size
+        by_user_type = {user_type: array("I") for user_type in USER_TYPES}
+        self.user_type_codes = bytearray(size)
+        for position, value in enumerate(catalog.field_values("user_type")):
+            user_types = tip_user_types(value)
+            for user_type in user_types:
+                by_user_type[user_type].append(position)
+            if len(user_types) == 1:
+                self.user_type_codes[position] = user_type_code(user_types[0])
+        by_season = {season: array("I") for season in SEASONS}
+        self.season_codes = bytearray(size)
+        for position, value in enumerate(catalog.field_values("category")):
+            seasons = tip_seasons(value)
+            for season in seasons:
+                by_season[season].append(position)
+            if len(seasons) == 1:
+                self.season_codes[position] = season_code(seasons[0])
+        self.partitions = {
+            "user_type": {value: Partition(f"user_type={value}", positions, size)
+                          for value, positions in by_user_type.items()},
+            "season": {value: Partition(f"season={value}", positions, size)
+                       for value, positions in by_season.items()},
+        }
+        self._category_partitions = {}
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def _category(self, category):
+        partition = self._category_partitions.get(category)
+        if partition is None:
+            partition = self._category_partitions[category] = Partition(
+                f"category={category}", self.catalog.positions_for(category), self.size)
+        return partition
+
+    def plan(self, category=None, user_type=None, season=None):
+        """Returns the partitions to intersect, most selective first.
+
+        Filters that are None, or whose partition covers the whole catalog,
+        are left out; ``res&com`` customers match tips of both user types.
+        A user type or season the catalog does not know matches nothing.
+        """
+        steps = []
+        if category is not None:
+            steps.append(self._category(category))
+        if user_type is not None:
+            user_types = customer_user_types(user_type)
+            if user_types is None:
+                return None
+            if len(user_types) == 1:
+                steps.append(self.partitions["user_type"][user_types[0]])
+        if season is not None:
+            partition = self.partitions["season"].get(normalize_text(season))
+            if partition is None:
+                return None
+            steps.append(partition)
+        steps = [step for step in steps if len(step) < self.size]
+        steps.sort(key=len)
+        return steps
+
+    def candidates(self, category=None, user_type=None, season=None):
+        """Positions (in catalog order) of the tips passing every filter."""
+        key = (category, normalize_text(user_type) if user_type is not None else None,
+               normalize_text(season) if season is not None else None)
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                return result
+        steps = self.plan(category, user_type, season)
+        if steps is None:
+            result = array("I")
+        elif not steps:
+            result = array("I", range(self.size))
+        else:
+            result = steps[0].positions
+            for step in steps[1:]:
+                mask = step.mask
+                result = array("I", [position for position in result if mask[position]])
+                if not result:
+                    break
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def filter(self, positions, user_type=None, season=None):
+        """The given positions that pass the user_type and season filters, in the same order."""
+        steps = self.plan(None, user_type, season)
+        if steps is None:
+            return []
+        return [position for position in positions if all(step.mask[position] for step in steps)]
@@ -0,0 +1,42 @@
+"""Top-k ranking of a customer's eligible tips.
+
+Large categories (General matches most of the catalog) are not rendered in
+full. Each eligible tip gets a small relevance score:
+
+* +4 if it is a seasonal tip for the current season,
+* +2 if it targets exactly the customer's user type (not res&com),
+* +1 if its rule is specific to the profile rather than ``Always``,
+
+and ``top_positions`` picks the best ``offset + limit`` with a heap
+(``heapq.nsmallest``, O(n log k)) instead of sorting the whole category.
+Ties keep catalog order. Scores only read per-tip codes prebuilt by
+TipQuery, so no tip is decoded until its page is shown.
+"""
+import heapq
+
+from smarttips.query import season_code, user_type_code
+
+SEASON_MATCH = 4
+USER_TYPE_MATCH = 2
+SPECIFIC_RULE = 1
+
+
+def relevance_scorer(catalog, user_type=None, season=None):
+    """Returns score(position) for tips shown to a customer of ``user_type`` in ``season``."""
+    query = catalog.query
+    season_codes, user_type_codes, rules = query.season_codes, query.user_type_codes, catalog.rules
+    season_wanted = season_code(season)
+    user_type_wanted = user_type_code(user_type)
+
+    def score(position):
+        return ((SEASON_MATCH if season_codes[position] == season_wanted else 0)
+                + (USER_TYPE_MATCH if user_type_codes[position] == user_type_wanted else 0)
+                + (SPECIFIC_RULE if rules[position].constant is None else 0))
+    return score
+
+
+def top_positions(catalog, positions, user_type=None, season=None, limit=10, offset=0):
+    """The positions ranked ``offset`` to ``offset + limit`` by relevance, best first."""
+    score = relevance_scorer(catalog, user_type, season)
+    best = heapq.nsmallest(offset + limit, positions, key=lambda position: (-score(position), position))
+    return best[offset:]
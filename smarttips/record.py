@@ -0,0 +1,183 @@
+"""Compact customer profile records.
+
+A profile used to be a dict holding every attribute twice, once under its
+display key (``"🧊 Freezer"``) and once under the internal key rules use
+(``"Freezer"``). ProfileRecord stores each attribute once, in a tuple aligned
+with PROFILE_FIELDS; display labels live in DISPLAY_NAMES and are only
+applied by ``display()``. Compiled rules look attributes up by their
+precomputed position in the tuple (``FIELD_INDEX``) instead of hashing a key.
+
+ProfileRecord is a read-only Mapping over the internal field names, so code
+written against profile dicts (``profile.get("custid")``) keeps working.
+ProfileTable is the columnar form for large populations: one list per field
+instead of one object per customer.
+"""
+from collections.abc import Mapping
+
+
+class _Missing:
+    """Marks an attribute the profile does not have."""
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+    def __bool__(self):
+        return False
+
+    def __reduce__(self):
+        return "MISSING"  # Unpickles to the module singleton
+
+
+MISSING = _Missing()
+
+# (internal field name, display label); fields without a label are not shown
+PROFILE_FIELDS = (
+    ("custid", None),
+    ("user_type", "👤 User Type"),
+    ("Freezer", "🧊 Freezer"),
+    ("Dishwasher", "🍽️ Dishwasher"),
+    ("Dryer", "💨 Dryer"),
+    ("Washer", "🧺 Washer"),
+    ("Pool", "🏊 Pool"),
+    ("Hot Tub", "🛁 Hot Tub"),
+    ("Pool Heater", "🔥 Pool Heater Months"),
+    ("Rate Plan", "💲 Rate Plan"),
+    ("Insulation Pre 1992", "🧱 Insulation Pre 1992"),
+    ("Programmable Thermostat", "🌡️ Programmable Thermostat"),
+    ("CFLs", "💡 CFLs/LEDs"),
+    ("Cool", "❄️ Cooling System"),
+    ("Water Heater Electric", "⚡ Electric Water Heater"),
+    ("Ducts", "🌬️ Ducts"),
+    ("Equipment", "🔧 Equipment"),
+)
+FIELD_NAMES = tuple(name for name, _ in PROFILE_FIELDS)
+FIELD_INDEX = {name: index for index, name in enumerate(FIELD_NAMES)}
+DISPLAY_NAMES = {name: label for name, label in PROFILE_FIELDS if label}
+# Display label -> field, for backends that still return display keys
+_FIELDS_BY_LABEL = {label: name for name, label in DISPLAY_NAMES.items()}
+
+
+class ProfileRecord(Mapping):
+    """One customer's attributes, stored once each in PROFILE_FIELDS order.
+
+    Records are immutable and shared between callers (the profile cache hands
+    out the same object); use ``replace()`` to derive a changed profile.
+    """
+    __slots__ = ("values",)
+
+    def __init__(self, values):
+        if len(values) != len(FIELD_NAMES):
+            raise ValueError(f"expected {len(FIELD_NAMES)} values, got {len(values)}")
+        self.values = tuple(values)
+
+    @classmethod
+    def from_fields(cls, **fields):
+        """Builds a record from internal field names; unknown names raise KeyError."""
+        values = [MISSING] * len(FIELD_NAMES)
+        for name, value in fields.items():
+            values[FIELD_INDEX[name]] = value
+        return cls(values)
+
+    @classmethod
+    def from_dict(cls, mapping):
+        """Builds a record from a profile dict keyed by internal names or display labels.
+
+        Keys that are neither are dropped.
+        """
+        values = [MISSING] * len(FIELD_NAMES)
+        for key, value in mapping.items():
+            index = FIELD_INDEX.get(key)
+            if index is None:
+                name = _FIELDS_BY_LABEL.get(key)
+                if name is None:
+                    continue
+                index = FIELD_INDEX[name]
+            values[index] = value
+        return cls(values)
+
+    def get(self, name, default=None):
+        index = FIELD_INDEX.get(name)
+        if index is None:
+            return default
+        value = self.values[index]
+        return default if value is MISSING else value
+
+    def __getitem__(self, name):
+        value = self.get(name, MISSING)
+        if value is MISSING:
+            raise KeyError(name)
+        return value
+
+    def __iter__(self):
+        return (name for name, value in zip(FIELD_NAMES, self.values) if value is not MISSING)
+
+    def __len__(self):
+        return sum(1 for value in self.values if value is not MISSING)
+
+    def __eq__(self, other):
+        if isinstance(other, ProfileRecord):
+            return self.values == other.values
+        return super().__eq__(other)
+
+    __hash__ = None  # Values may be lists (Equipment)
+
+    def __repr__(self):
+        return f"ProfileRecord({self.to_dict()!r})"
+
+    def replace(self, changes):
+        """Returns a new record with ``changes`` ({field: value}) applied."""
+        values = list(self.values)
+        for name, value in changes.items():
+            values[FIELD_INDEX[name]] = value
+        return ProfileRecord(values)
+
+    def to_dict(self):
+        """Plain dict keyed by internal field names."""
+        return {name: value for name, value in zip(FIELD_NAMES, self.values) if value is not MISSING}
+
+    def display(self):
+        """Dict of the displayable attributes keyed by their display labels."""
+        return {DISPLAY_NAMES[name]: value for name, value in zip(FIELD_NAMES, self.values)
+                if value is not MISSING and name in DISPLAY_NAMES}
+
+
+def as_profile_record(profile):
+    """Returns ``profile`` as a ProfileRecord (records are returned unchanged)."""
+    if isinstance(profile, ProfileRecord):
+        return profile
+    return ProfileRecord.from_dict(profile)
+
+
+class ProfileTable:
+    """Columnar profiles for large populations: one list per field.
+
+    ``table[row]`` materializes a ProfileRecord; ``column(name)`` gives the
+    whole column (used by smarttips.batch without per-profile lookups).
+    """
+
+    def __init__(self, columns=None):
+        self.columns = columns if columns is not None else [[] for _ in FIELD_NAMES]
+
+    @classmethod
+    def from_records(cls, profiles):
+        table = cls()
+        for profile in profiles:
+            table.append(profile)
+        return table
+
+    def append(self, profile):
+        for column, value in zip(self.columns, as_profile_record(profile).values):
+            column.append(value)
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def __getitem__(self, row):
+        return ProfileRecord([column[row] for column in self.columns])
+
+    def __iter__(self):
+        return (ProfileRecord(values) for values in zip(*self.columns))
+
+    def column(self, name):
+        return self.columns[FIELD_INDEX[name]]
@@ -0,0 +1,304 @@
+"""Tip rule compiler.
+
+Rules in the tip catalog are short strings such as ``If Freezer = "Yes"`` or
+``If Pool Heater Greater than 0 Months``. Instead of re-parsing those strings
+every time a tip is checked, each distinct rule is compiled once into a small
+predicate object with the attribute, the normalized operator and a pre-coerced
+value already resolved. Rules that cannot be parsed compile to a predicate that
+never matches and carries an ``error`` explaining why, so they can be reported
+once when the catalog is loaded.
+"""
+import logging
+import re
+from functools import lru_cache
+
+from smarttips.record import FIELD_INDEX, MISSING, ProfileRecord
+
+logger = logging.getLogger(__name__)
+
+# Version of the rule compiler and category derivation. Compiled catalog caches
+# (smarttips.store) store categories derived by it, so bump this whenever
+# compile_rule or get_appliance_from_rule changes what they return.
+COMPILER_VERSION = 2
+
+# Profile attributes that rules can refer to (ProfileRecord fields).
+RULE_ATTRIBUTES = (
+    "user_type", "Freezer", "Dishwasher", "Dryer", "Washer", "Pool", "Hot Tub",
+    "Pool Heater", "Rate Plan", "Insulation Pre 1992", "Programmable Thermostat",
+    "CFLs", "Cool", "Water Heater Electric", "Ducts",
+)
+# Longest first so "Pool Heater" wins over "Pool".
+_ATTRIBUTES_BY_LENGTH = sorted(RULE_ATTRIBUTES, key=len, reverse=True)
+
+# Normalized operator names
+OP_EQUALS = "="
+OP_NOT_EQUAL = "Not Equal"
+OP_GREATER_THAN = "Greater than"
+
+# Spellings found in the catalog, matched case-insensitively
+_OPERATOR_ALIASES = {
+    "=": OP_EQUALS,
+    "equals": OP_EQUALS,
+    "not equal": OP_NOT_EQUAL,
+    "not equal to": OP_NOT_EQUAL,
+    "greater than": OP_GREATER_THAN,
+}
+_OPERATORS_BY_LENGTH = sorted(_OPERATOR_ALIASES, key=len, reverse=True)
+
+# Rule matched against the tip's own key fields (see smarttips.equipment)
+EQUIPMENT_KEY_RULE = "If match on All five Keys"
+
+# Rules we recognise but cannot evaluate yet
+UNSUPPORTED_RULES = {}
+
+_QUOTED_VALUE = re.compile(r'"([^"]*)"')
+# A number optionally followed by a unit, e.g. "0 Months"
+_NUMERIC_VALUE = re.compile(r"(-?\d+(?:\.\d*)?)(?:\s+[A-Za-z]+)?")
+
+class CompiledRule:
+    """Base class for compiled rule predicates.
+
+    ``index`` is the attribute's position in a ProfileRecord, so evaluating
+    against a record is a tuple lookup; plain dict profiles still work.
+    """
+    __slots__ = ("source", "category", "attribute", "index", "value", "error")
+
+    # True/False when the outcome does not depend on the profile, else None
+    constant = None
+    operator = None
+
+    def __init__(self, source, category, attribute=None, value=None, error=None):
+        self.source = source
+        self.category = category
+        self.attribute = attribute
+        self.index = FIELD_INDEX.get(attribute)
+        self.value = value
+        self.error = error
+
+    def evaluate(self, profile):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.source!r})"
+
+
+class AlwaysRule(CompiledRule):
+    """Matches every profile."""
+    __slots__ = ()
+    constant = True
+
+    def evaluate(self, profile):
+        return True
+
+
+class NeverRule(CompiledRule):
+    """Matches no profile; used for unsupported and unparsable rules."""
+    __slots__ = ()
+    constant = False
+
+    def evaluate(self, profile):
+        return False
+
+
+class EquipmentKeyRule(CompiledRule):
+    """``If match on All five Keys``: depends on the tip's key fields, not just the rule.
+
+    The rule string alone cannot decide a match, so ``evaluate`` is always
+    False; TipCatalog resolves these tips through its EquipmentKeyIndex.
+    """
+    __slots__ = ()
+
+    def evaluate(self, profile):
+        return False
+
+
+class FlagRule(CompiledRule):
+    """Bare attribute rule such as ``If Insulation Pre 1992``."""
+    __slots__ = ()
+
+    def evaluate(self, profile):
+        if type(profile) is ProfileRecord:
+            return profile.values[self.index] is True
+        return profile.get(self.attribute, False) is True
+
+
+class EqualsRule(CompiledRule):
+    """``If <attribute> = <value>``, comparing as strings or as a yes/no flag."""
+    __slots__ = ("flag",)
+    operator = OP_EQUALS
+
+    def __init__(self, source, category, attribute, value):
+        super().__init__(source, category, attribute, value)
+        self.flag = value.lower() in ("yes", "true")
+
+    def evaluate(self, profile):
+        if type(profile) is ProfileRecord:
+            profile_value = profile.values[self.index]
+        else:
+            profile_value = profile.get(self.attribute, MISSING)
+        if profile_value is MISSING:
+            return False
+        if isinstance(profile_value, bool):
+            return profile_value == self.flag
+        return str(profile_value) == self.value
+
+
+class NotEqualRule(EqualsRule):
+    """``If <attribute> Not Equal to <value>``."""
+    __slots__ = ()
+    operator = OP_NOT_EQUAL
+
+    def evaluate(self, profile):
+        if type(profile) is ProfileRecord:
+            profile_value = profile.values[self.index]
+        else:
+            profile_value = profile.get(self.attribute, MISSING)
+        if profile_value is MISSING:
+            return False
+        if isinstance(profile_value, bool):
+            return profile_value != self.flag
+        return str(profile_value) != self.value
+
+
+class GreaterThanRule(CompiledRule):
+    """``If <attribute> Greater than <number> [unit]``, compared numerically."""
+    __slots__ = ()
+    operator = OP_GREATER_THAN
+
+    def evaluate(self, profile):
+        if type(profile) is ProfileRecord:
+            profile_value = profile.values[self.index]
+        else:
+            profile_value = profile.get(self.attribute, MISSING)
+        if profile_value is MISSING:
+            return False
+        try:
+            return float(profile_value) > self.value
+        except (ValueError, TypeError):
+            return False
+
+
+def get_appliance_from_rule(rule_str):
+    """Attempts to infer the primary appliance/category from a rule string."""
+    rule_str = rule_str.strip()
+    if rule_str == "Always":
+        return "General"
+
+    # Simple extraction based on the first word after "If"
+    # Covers rules like "If Freezer = ...", "If Pool = ...", "If Rate Plan = ..."
+    if rule_str.startswith("If "):
+        parts = rule_str[3:].split()
+        if parts:
+            # Consider known multi-word entities first
+            if rule_str.startswith("If Pool Heater "):
+                 return "Pool Heater"
+            if rule_str.startswith("If Water Heater "):
+                 return "Water Heater"
+            if rule_str.startswith("If Rate Plan "):
+                 return "Rate Plan" # Categorize as non-appliance general
+            if rule_str.startswith("If Insulation Pre "):
+                 return "Insulation" # Categorize as non-appliance general
+            # Default to the first word if it seems like an appliance/attribute
+            first_word = parts[0]
+            # Add more known appliance/attribute names here if needed
+            known_entities = ["Freezer", "Refrigerator", "Washer", "Dishwasher", "Dryer",
+                              "Pool", "Hot Tub", "Thermostat", "CFLs", "Cool", "Ducts", "Heater"]
+            if first_word in known_entities:
+                 return first_word
+            # Fallback for other "If" rules - could be general or unclassifiable
+            return "General" # Or perhaps None if we want to be stricter
+
+    return "General" # Default for any other unparsed rules
+
+
+def _parse_value(text):
+    """Returns (value, error) for the text following the operator."""
+    if not text:
+        return None, "missing value"
+    if text.startswith('"'):
+        match = _QUOTED_VALUE.fullmatch(text)
+        if match is None:
+            return None, f"unexpected text around quoted value {text!r}"
+        return match.group(1), None
+    return text, None
+
+
+@lru_cache(maxsize=None)
+def compile_rule(rule_str):
+    """Compiles a rule string into a CompiledRule (cached per distinct string)."""
+    source = rule_str.strip()
+    category = get_appliance_from_rule(source)
+
+    if source == "Always":
+        return AlwaysRule(source, category)
+    if source == EQUIPMENT_KEY_RULE:
+        return EquipmentKeyRule(source, category)
+    if source in UNSUPPORTED_RULES:
+        return NeverRule(source, category, error=UNSUPPORTED_RULES[source])
+    if not source.startswith("If "):
+        return NeverRule(source, category, error="rule does not start with 'If'")
+
+    body = source[3:].strip()
+    attribute = next((name for name in _ATTRIBUTES_BY_LENGTH
+                      if body == name or body.startswith(name + " ")), None)
+    if attribute is None:
+        return NeverRule(source, category, error="unknown attribute")
+
+    rest = body[len(attribute):].strip()
+    if not rest:
+        return FlagRule(source, category, attribute)
+
+    rest_lower = rest.lower()
+    operator = None
+    for alias in _OPERATORS_BY_LENGTH:
+        if rest_lower == alias or rest_lower.startswith(alias + " ") or (alias == "=" and rest.startswith("=")):
+            operator = _OPERATOR_ALIASES[alias]
+            rest = rest[len(alias):].strip()
+            break
+    if operator is None:
+        # A lone quoted value, e.g. 'If Programmable Thermostat "No"', reads as equality
+        if not _QUOTED_VALUE.fullmatch(rest):
+            return NeverRule(source, category, attribute, error=f"unsupported operator in {rest!r}")
+        operator = OP_EQUALS
+
+    value, error = _parse_value(rest)
+    if error:
+        return NeverRule(source, category, attribute, error=error)
+
+    if operator == OP_GREATER_THAN:
+        match = _NUMERIC_VALUE.fullmatch(value)
+        if match is None:
+            return NeverRule(source, category, attribute, error=f"non-numeric value {value!r}")
+        return GreaterThanRule(source, category, attribute, float(match.group(1)))
+    if operator == OP_NOT_EQUAL:
+        return NotEqualRule(source, category, attribute, value)
+    return EqualsRule(source, category, attribute, value)
+
+
+def compile_catalog(tips):
+    """Compiles the rule of every tip, logging each unusable rule once.
+
+    Returns a list of CompiledRule objects aligned with ``tips``.
+    """
+    compiled = [compile_rule(tip.get("rule", "")) for tip in tips]
+    log_rule_errors(compiled)
+    return compiled
+
+
+def log_rule_errors(compiled_rules):
+    """Logs a warning for each distinct rule that can never match."""
+    reported = set()
+    for rule in compiled_rules:
+        if rule.error and rule.source not in reported:
+            reported.add(rule.source)
+            logger.warning("Tip rule %r will never match: %s", rule.source, rule.error)
+
+
+def rule_errors(compiled_rules):
+    """Returns {rule source: error} for rules that cannot be evaluated."""
+    return {rule.source: rule.error for rule in compiled_rules if rule.error}
+
+
+def evaluate_rule(rule_str, profile):
+    """Evaluates if a tip's rule applies to the customer profile."""
+    return compile_rule(rule_str).evaluate(profile)
@@ -0,0 +1,261 @@
+"""Sharded, resumable multiprocess batch runner.
+
+    smarttips run --input custids.csv --out-dir results/ --workers 8
+
+Customer ids are streamed from a text, CSV or JSONL file and grouped into
+shards of ``shard_size`` ids. Each shard is sent to a process pool worker,
+which fetches the profiles, evaluates them and writes ``part-NNNNN.jsonl``
+(via a temporary file, so a shard file is either complete or absent). Workers
+open the compiled catalog cache once, at start-up; the mapping is shared
+through the OS page cache, so adding workers adds no per-worker catalog copy.
+
+Finished shards are recorded in ``checkpoint.json`` in the output directory.
+Rerunning the same command skips them and only processes what is left; the
+checkpoint also pins the input file, shard size, catalog version and season,
+so a run never resumes into a different configuration. The season is resolved
+once by the driver (default: the current one) and handed to every worker.
+"""
+import csv
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+from smarttips.query import current_season
+from smarttips.store import cache_path_for, load_compiled_catalog, open_catalog_cache
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "checkpoint.json"
+_CUSTID_FIELDS = ("custid", "CustID", "customer_id")
+
+
+class CheckpointError(Exception):
+    """Raised when an output directory holds a checkpoint from a different run."""
+
+
+def shard_path(out_dir, shard):
+    return os.path.join(out_dir, f"part-{shard:05d}.jsonl")
+
+
+# --- Streaming input ---
+def _custid_from_record(record):
+    if isinstance(record, dict):
+        for field in _CUSTID_FIELDS:
+            if record.get(field) not in (None, ""):
+                return str(record[field])
+        return None
+    return None if record is None else str(record)
+
+
+def iter_custids(path):
+    """Yields custids from a text (one per line), CSV or JSONL file without loading it whole.
+
+    CSV files use their ``custid`` column when the header has one, else the
+    first column; JSONL lines may be objects with a ``custid`` or bare ids.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, 'r', newline='') as f:
+        if extension == ".csv":
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            column = next((header.index(field) for field in _CUSTID_FIELDS if field in header), None)
+            if column is None:
+                column = 0
+                if header and header[0].strip():
+                    yield header[0].strip()  # No recognised header: the first row is data
+            for row in reader:
+                if len(row) > column and row[column].strip():
+                    yield row[column].strip()
+        elif extension in (".jsonl", ".ndjson"):
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    custid = _custid_from_record(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning("Skipping invalid JSON on line %d of %s", line_number, path)
+                    continue
+                if custid:
+                    yield custid.strip()
+        else:
+            for line in f:
+                custid = line.strip()
+                if custid:
+                    yield custid
+
+
+def _shards(custids, shard_size):
+    iterator = iter(custids)
+    shard = 0
+    while chunk := list(islice(iterator, shard_size)):
+        yield shard, chunk
+        shard += 1
+
+
+# --- Checkpoints ---
+def _write_json_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f, indent=1)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(out_dir, run_key):
+    """Returns the set of finished shards recorded for ``run_key`` (empty if none)."""
+    path = os.path.join(out_dir, CHECKPOINT_NAME)
+    try:
+        with open(path, 'r') as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return set()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise CheckpointError(f"Checkpoint {path} is unreadable; use --restart to start over.") from None
+    if checkpoint.get("run") != run_key:
+        raise CheckpointError(
+            f"{out_dir} holds results of a different run (input, shard size, catalog version or season changed); "
+            "use --restart to start over or choose another --out-dir.")
+    # A shard only counts as done if its file is still there
+    return {shard for shard in checkpoint.get("completed", ()) if os.path.exists(shard_path(out_dir, shard))}
+
+
+def save_checkpoint(out_dir, run_key, completed):
+    _write_json_atomic(os.path.join(out_dir, CHECKPOINT_NAME), {
+        "run": run_key,
+        "completed": sorted(completed),
+        "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+
+
+def clear_run(out_dir):
+    """Removes the checkpoint and shard files of a previous run."""
+    for name in os.listdir(out_dir):
+        if name == CHECKPOINT_NAME or (name.startswith("part-") and name.endswith(".jsonl")):
+            os.unlink(os.path.join(out_dir, name))
+
+
+# --- Worker process ---
+_worker_engine = None
+_worker_chunk_size = None
+_worker_season = None
+
+
+def _init_worker(cache_path, latency, connections, chunk_size, store_path, season):
+    global _worker_engine, _worker_chunk_size, _worker_season
+    from smarttips.engine import RecommendationEngine
+    from smarttips.materialized import RecommendationStore
+    from smarttips.profiles import ProfileProvider, SimulatedProfileBackend
+
+    logging.getLogger("smarttips").setLevel(logging.ERROR)  # The parent already logged rule errors
+    _worker_engine = RecommendationEngine(
+        open_catalog_cache(cache_path),
+        ProfileProvider(SimulatedProfileBackend(latency=latency), max_connections=connections,
+                        cache_size=chunk_size, bulk_chunk_size=chunk_size),
+        store=RecommendationStore(store_path) if store_path else None,
+    )
+    _worker_chunk_size = chunk_size
+    _worker_season = season
+
+
+def _run_shard(shard, custids, out_path):
+    """Writes one shard's recommendations; returns (shard, customers written)."""
+    count = 0
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(out_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as out:
+            for start in range(0, len(custids), _worker_chunk_size):
+                for result in _worker_engine.recommend_many(custids[start:start + _worker_chunk_size],
+                                                             season=_worker_season):
+                    out.write(json.dumps(result) + "\n")
+                    count += 1
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return shard, count
+
+
+# --- Driver ---
+def run(input_path, out_dir, catalog_path, workers=None, shard_size=10000, chunk_size=500,
+        connections=8, latency=0.5, cache_dir=None, checkpoint_interval=5.0, restart=False, store_path=None,
+        season=None, log=print):
+    """Processes every custid in ``input_path``; returns a summary dict.
+
+    At most ``2 * workers`` shards are in flight, so memory stays bounded no
+    matter how large the input file is. With ``store_path`` every worker also
+    upserts its results into that SQLite results store (one transaction per
+    chunk) and serves customers already in it. Every customer is evaluated
+    for ``season`` (default: the season when the run starts).
+    """
+    workers = workers or os.cpu_count() or 1
+    season = season or current_season()
+    os.makedirs(out_dir, exist_ok=True)
+    catalog = load_compiled_catalog(catalog_path, cache_dir)  # Builds the cache file the workers map
+    cache_path = cache_path_for(catalog_path, catalog.version, cache_dir)
+    run_key = {
+        "input": os.path.abspath(input_path),
+        "shard_size": shard_size,
+        "catalog_version": catalog.version,
+        "season": season,
+    }
+    if restart:
+        clear_run(out_dir)
+    completed = load_checkpoint(out_dir, run_key)
+    skipped = len(completed)
+    if skipped:
+        log(f"Resuming: {skipped} shard(s) already finished.")
+
+    customers = written = 0
+    next_checkpoint = time.monotonic() + checkpoint_interval
+    started = time.perf_counter()
+    pending = set()
+
+    def collect(done):
+        nonlocal written
+        for future in done:
+            shard, count = future.result()  # Re-raises worker errors; finished shards stay checkpointed
+            completed.add(shard)
+            written += count
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cache_path, latency, connections, chunk_size, store_path, season)) as pool:
+        try:
+            for shard, custids in _shards(iter_custids(input_path), shard_size):
+                customers += len(custids)
+                if shard in completed:
+                    continue
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending.add(pool.submit(_run_shard, shard, custids, shard_path(out_dir, shard)))
+                if time.monotonic() >= next_checkpoint:
+                    save_checkpoint(out_dir, run_key, completed)
+                    next_checkpoint = time.monotonic() + checkpoint_interval
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        finally:
+            # On errors/interrupts, shards still running are redone on resume
+            for future in pending:
+                future.cancel()
+            save_checkpoint(out_dir, run_key, completed)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "customers": customers,
+        "written": written,
+        "shards": len(completed),
+        "skipped_shards": skipped,
+        "seconds": round(elapsed, 3),
+        "catalog_version": catalog.version,
+        "season": season,
+    }
@@ -0,0 +1,142 @@
+"""Free-text tip search: an in-memory inverted index with BM25 scoring.
+
+Headlines and descriptions are tokenized (lowercased words, a few stopwords
+dropped, plural "s" stripped so "pumps" finds "pump"); headline terms count
+twice, so a query word in the headline outweighs one in the body. For every
+term the index keeps its postings (tip positions) with the term's BM25
+contribution precomputed, twice: sorted by contribution, and sorted by
+position for lookups with ``bisect``.
+
+Queries use the threshold algorithm: the impact-sorted lists of the query
+terms are read in parallel, each newly seen tip is scored completely through
+the position-sorted lists, and reading stops once the ``limit``-th best score
+reaches the sum of the impacts at the current depth, which no unseen tip can
+beat. Rare terms and selective queries therefore stop after a few postings
+instead of scoring every tip that contains a common word. ``allowed``
+restricts results to a set of positions, e.g. a customer's eligible tips.
+
+TipCatalog builds its index on first use (CatalogStore warms it in the
+background after each reload), so every catalog version gets a fresh index.
+"""
+import heapq
+import math
+import re
+from array import array
+from bisect import bisect_left
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "for", "from", "how", "i", "if", "in", "into",
+    "is", "it", "its", "me", "my", "of", "on", "or", "our", "so", "than", "that", "the", "their", "them",
+    "there", "these", "this", "to", "up", "was", "what", "when", "which", "with", "you", "your",
+    "about", "tip", "tips",
+))
+HEADLINE_WEIGHT = 2
+
+
+def _stem(token):
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        if token.endswith("ies") and len(token) > 4:
+            return token[:-3] + "y"
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Lowercased, stemmed search terms of ``text`` without stopwords."""
+    if not text:
+        return []
+    return [_stem(token) for token in _TOKEN.findall(str(text).lower()) if token not in STOPWORDS]
+
+
+class SearchIndex:
+    """BM25 inverted index over tip headlines and descriptions."""
+
+    def __init__(self, postings, size, k1=1.2, b=0.75):
+        # term -> (positions, impacts) sorted by impact, then (positions, impacts) sorted by position
+        self._postings = postings
+        self.size = size
+        self.k1 = k1
+        self.b = b
+
+    @classmethod
+    def build(cls, catalog, k1=1.2, b=0.75):
+        term_postings = {}  # term -> (positions, term frequencies)
+        lengths = array("I")
+        for position, (headline, description) in enumerate(
+                zip(catalog.field_values("headline"), catalog.field_values("description"))):
+            frequencies = {}
+            for term in tokenize(headline):
+                frequencies[term] = frequencies.get(term, 0) + HEADLINE_WEIGHT
+            for term in tokenize(description):
+                frequencies[term] = frequencies.get(term, 0) + 1
+            lengths.append(sum(frequencies.values()))
+            for term, frequency in frequencies.items():
+                entry = term_postings.get(term)
+                if entry is None:
+                    entry = term_postings[term] = (array("I"), array("I"))
+                entry[0].append(position)
+                entry[1].append(frequency)
+
+        size = len(lengths)
+        average_length = (sum(lengths) / size) if size else 0.0
+        postings = {}
+        for term, (positions, frequencies) in term_postings.items():
+            idf = math.log(1 + (size - len(positions) + 0.5) / (len(positions) + 0.5))
+            scored = sorted(
+                ((idf * frequency * (k1 + 1)
+                  / (frequency + k1 * (1 - b + b * lengths[position] / average_length)), position)
+                 for position, frequency in zip(positions, frequencies)),
+                key=lambda item: (-item[0], item[1]))
+            by_position = sorted(scored, key=lambda item: item[1])
+            postings[term] = (array("I", (position for _, position in scored)),
+                              array("f", (impact for impact, _ in scored)),
+                              array("I", (position for _, position in by_position)),
+                              array("f", (impact for impact, _ in by_position)))
+        return cls(postings, size, k1, b)
+
+    def __len__(self):
+        return len(self._postings)
+
+    def document_frequency(self, term):
+        entry = self._postings.get(_stem(term.lower()))
+        return len(entry[0]) if entry else 0
+
+    def search(self, query, limit=10, allowed=None):
+        """Returns up to ``limit`` (position, score) pairs, best first.
+
+        ``allowed`` is an optional container of positions results must be in.
+        """
+        postings = [self._postings[term] for term in dict.fromkeys(tokenize(query)) if term in self._postings]
+        if not postings or limit <= 0:
+            return []
+        top = []  # Min-heap of (score, -position), at most ``limit`` entries
+        seen = set()
+        depth = 0
+        longest = max(len(entry[0]) for entry in postings)
+        while depth < longest:
+            threshold = 0.0
+            for by_impact, impacts, _, _ in postings:
+                if depth >= len(by_impact):
+                    continue
+                threshold += impacts[depth]
+                position = by_impact[depth]
+                if position in seen:
+                    continue
+                seen.add(position)
+                if allowed is not None and position not in allowed:
+                    continue
+                score = 0.0
+                for _, _, by_position, position_impacts in postings:
+                    index = bisect_left(by_position, position)
+                    if index < len(by_position) and by_position[index] == position:
+                        score += position_impacts[index]
+                entry = (score, -position)
+                if len(top) < limit:
+                    heapq.heappush(top, entry)
+                elif entry > top[0]:
+                    heapq.heapreplace(top, entry)
+            if len(top) == limit and top[0][0] >= threshold:
+                break  # No unseen tip can score above the current top ``limit``
+            depth += 1
+        return [(-negated, score) for score, negated in sorted(top, reverse=True)]
@@ -0,0 +1,326 @@
+"""Versioned, hot-reloading tip catalog backed by a memory-mapped cache file.
+
+The JSON catalog is compiled into a compact binary file (interned strings,
+per-tip rule ids and the category index) stored next to the source in
+``.smarttips-cache/``. Processes open that file with ``mmap``, so the catalog
+pages are shared through the OS page cache instead of every worker holding
+its own parsed copy; tips are only decoded into dicts when they are read.
+
+Cache files are keyed by the source content hash, the cache format, the rule
+compiler version (``rules.COMPILER_VERSION``) and the byte order, and their
+header repeats all but the hash, so a code change that alters the layout or
+the derived categories makes old files misses that get rebuilt.
+
+CatalogStore watches the source file and, when its contents change, builds
+and maps the new cache file and swaps it in atomically. Readers always see a
+complete catalog; the previous one keeps serving if the new file is invalid.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from collections.abc import Sequence
+from functools import lru_cache
+
+from smarttips import metrics
+from smarttips.catalog import CatalogError, TipCatalog, catalog_version, parse_tips, read_catalog_file
+from smarttips.rules import COMPILER_VERSION, compile_rule
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_NAME = ".smarttips-cache"
+CACHE_SUFFIX = ".stcat"
+
+# Bump when the file layout changes
+CACHE_FORMAT = 2
+_MAGIC = b"STCAT\x00" + CACHE_FORMAT.to_bytes(2, "little")
+_BYTE_ORDER_MARK = 0x01020304
+# magic, byte order mark, compiler version, version, tips, fields, strings, rules, categories
+_HEADER = struct.Struct("=8sII16sIIIII")
+_NO_VALUE = 0xFFFFFFFF
+_ITEM_SIZE = array("I").itemsize
+
+
+class MappedTips(Sequence):
+    """Read-only sequence of tips decoded on demand from a mapped cache file.
+
+    Recently read tips are kept decoded; returned dicts are shared and must
+    not be mutated.
+    """
+
+    def __init__(self, strings, fields, records, tip_cache_size=4096):
+        self._strings = strings
+        self._fields = fields
+        self._records = records
+        self._width = len(fields)
+        self._decoded = lru_cache(maxsize=tip_cache_size)(self._decode)
+
+    def __len__(self):
+        return len(self._records) // self._width if self._width else 0
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("tip index out of range")
+        return self._decoded(position)
+
+    def field_values(self, field):
+        """Yields one field of every tip without decoding whole tips (None where absent)."""
+        try:
+            column = self._fields.index(field)
+        except ValueError:
+            yield from (None for _ in range(len(self)))
+            return
+        decoded = {_NO_VALUE: None}
+        for value_id in self._records[column::self._width]:
+            value = decoded.get(value_id)
+            if value is None and value_id not in decoded:
+                value = decoded[value_id] = json.loads(self._strings[value_id])
+            yield value
+
+    def _decode(self, position):
+        start = position * self._width
+        tip = {}
+        for field, value_id in zip(self._fields, self._records[start:start + self._width]):
+            if value_id != _NO_VALUE:
+                tip[field] = json.loads(self._strings[value_id])
+        return tip
+
+
+class _StringTable:
+    """Interned UTF-8 strings stored as offsets into one blob."""
+
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __getitem__(self, string_id):
+        return str(self._blob[self._offsets[string_id]:self._offsets[string_id + 1]], "utf-8")
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+
+def write_catalog_cache(path, tips, version):
+    """Compiles ``tips`` into the binary cache format and writes it atomically."""
+    interned = {}
+
+    def intern(text):
+        string_id = interned.get(text)
+        if string_id is None:
+            string_id = interned[text] = len(interned)
+        return string_id
+
+    fields = list(dict.fromkeys(field for tip in tips for field in tip))
+    field_ids = array("I", (intern(field) for field in fields))
+    records = array("I")
+    rule_ids = array("I")
+    rule_positions = {}
+    category_index = {}
+    for position, tip in enumerate(tips):
+        for field in fields:
+            records.append(intern(json.dumps(tip[field], ensure_ascii=False)) if field in tip else _NO_VALUE)
+        rule = compile_rule(tip.get("rule", ""))
+        rule_ids.append(rule_positions.setdefault(rule.source, len(rule_positions)))
+        category_index.setdefault(rule.category, array("I")).append(position)
+    rule_source_ids = array("I", (intern(source) for source in rule_positions))
+    category_ids = array("I", (intern(category) for category in category_index))
+    posting_offsets = array("I", [0])
+    postings = array("I")
+    for positions in category_index.values():
+        postings.extend(positions)
+        posting_offsets.append(len(postings))
+
+    blob = bytearray()
+    string_offsets = array("I", [0])
+    for text in interned:  # dicts keep insertion order, i.e. string id order
+        blob += text.encode("utf-8")
+        string_offsets.append(len(blob))
+
+    header = _HEADER.pack(_MAGIC, _BYTE_ORDER_MARK, COMPILER_VERSION, version.encode("ascii"), len(tips),
+                          len(fields), len(interned), len(rule_positions), len(category_index))
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            for section in (string_offsets, field_ids, records, rule_ids, rule_source_ids,
+                            category_ids, posting_offsets, postings):
+                section.tofile(f)
+            f.write(blob)
+        os.chmod(tmp_path, 0o644)  # Readable by every worker process
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def open_catalog_cache(path):
+    """Memory-maps a cache file written by write_catalog_cache as a TipCatalog."""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    if len(view) < _HEADER.size or bytes(view[:len(_MAGIC)]) != _MAGIC:
+        raise CatalogError(f"{path} is not a catalog cache file of format {CACHE_FORMAT}.")
+    (magic, byte_order, compiler_version, version, n_tips, n_fields, n_strings, n_rules,
+     n_categories) = _HEADER.unpack_from(view)
+    if byte_order != _BYTE_ORDER_MARK:
+        raise CatalogError(f"{path} is not a catalog cache file for this platform.")
+    if compiler_version != COMPILER_VERSION:
+        raise CatalogError(f"{path} was compiled by rule compiler version {compiler_version}, "
+                           f"not {COMPILER_VERSION}.")
+    offset = _HEADER.size
+
+    def take(count):
+        nonlocal offset
+        end = offset + count * _ITEM_SIZE
+        if end > len(view):
+            raise CatalogError(f"{path} is truncated.")
+        section = view[offset:end].cast("I")
+        offset = end
+        return section
+
+    string_offsets = take(n_strings + 1)
+    field_ids = take(n_fields)
+    records = take(n_tips * n_fields)
+    rule_ids = take(n_tips)
+    rule_source_ids = take(n_rules)
+    category_ids = take(n_categories)
+    posting_offsets = take(n_categories + 1)
+    postings = take(posting_offsets[-1])
+    if offset + string_offsets[-1] != len(view):
+        raise CatalogError(f"{path} has an unexpected size.")
+    strings = _StringTable(string_offsets, view[offset:])
+
+    compiled = [compile_rule(strings[string_id]) for string_id in rule_source_ids]
+    rules = [compiled[rule_id] for rule_id in rule_ids]
+    category_index = {
+        strings[string_id]: postings[posting_offsets[i]:posting_offsets[i + 1]]
+        for i, string_id in enumerate(category_ids)
+    }
+    tips = MappedTips(strings, [strings[string_id] for string_id in field_ids], records)
+    return TipCatalog(tips, version=version.decode("ascii"), rules=rules, category_index=category_index)
+
+
+def cache_path_for(source_path, version, cache_dir=None):
+    source_path = os.path.abspath(source_path)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(source_path), CACHE_DIR_NAME)
+    stem = os.path.basename(source_path)
+    return os.path.join(cache_dir, f"{stem}.{version}.f{CACHE_FORMAT}c{COMPILER_VERSION}.{sys.byteorder}{CACHE_SUFFIX}")
+
+
+def load_compiled_catalog(source_path, cache_dir=None):
+    """Returns the mapped catalog for the current source contents, building its cache if needed."""
+    raw = read_catalog_file(source_path)
+    return _load_compiled(source_path, raw, cache_dir)
+
+
+def _load_compiled(source_path, raw, cache_dir):
+    version = catalog_version(raw)
+    path = cache_path_for(source_path, version, cache_dir)
+    if os.path.exists(path):
+        try:
+            return open_catalog_cache(path)
+        except (CatalogError, ValueError, struct.error) as e:
+            logger.warning("Rebuilding unreadable catalog cache %s: %s", path, e)
+    write_catalog_cache(path, parse_tips(raw, source_path), version)
+    _remove_stale_caches(source_path, path)
+    return open_catalog_cache(path)
+
+
+def _remove_stale_caches(source_path, current_path):
+    directory = os.path.dirname(current_path)
+    prefix = os.path.basename(os.path.abspath(source_path)) + "."
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith(prefix) and name.endswith(CACHE_SUFFIX) and path != current_path:
+            try:
+                os.unlink(path)  # Processes that mapped it keep their mapping
+            except OSError:
+                pass
+
+
+class CatalogStore:
+    """Serves the current catalog and hot-reloads it when the source file changes.
+
+    ``current()`` checks the source file's mtime/size at most every
+    ``check_interval`` seconds; a changed file is hashed and, if its contents
+    differ, compiled and swapped in. ``generation`` counts the swaps made by
+    this store, ``current().version`` identifies the contents.
+    """
+
+    def __init__(self, source_path, cache_dir=None, check_interval=2.0, clock=time.monotonic):
+        self.source_path = source_path
+        self.cache_dir = cache_dir
+        self.check_interval = check_interval
+        self.generation = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stat = None
+        self._next_check = 0.0
+        self._catalog = None
+        self.reload()
+
+    def _source_stat(self):
+        try:
+            stat = os.stat(self.source_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def current(self):
+        """Returns the latest catalog, reloading it first if the source changed."""
+        if self._clock() >= self._next_check:
+            self.refresh()
+        return self._catalog
+
+    def refresh(self):
+        """Reloads the catalog if the source file changed; returns True if swapped."""
+        with self._lock:
+            self._next_check = self._clock() + self.check_interval
+            stat = self._source_stat()
+            if stat is None or stat == self._stat:
+                return False
+            try:
+                return self._reload_locked(stat)
+            except (CatalogError, OSError) as e:
+                # Keep serving the previous catalog; retry after the file changes again
+                self._stat = stat
+                logger.error("Keeping catalog version %s, reload failed: %s",
+                             self._catalog.version if self._catalog else None, e)
+                return False
+
+    def reload(self):
+        """Loads the catalog unconditionally (raises CatalogError on failure)."""
+        with self._lock:
+            self._next_check = self._clock() + self.check_interval
+            self._stat = None
+            return self._reload_locked(self._source_stat())
+
+    def _reload_locked(self, stat):
+        raw = read_catalog_file(self.source_path)
+        self._stat = stat
+        if self._catalog is not None and catalog_version(raw) == self._catalog.version:
+            return False
+        catalog = _load_compiled(self.source_path, raw, self.cache_dir)
+        self._catalog = catalog  # Atomic swap: readers see the old or the new catalog
+        self.generation += 1
+        # Build the new version's search index off the request path
+        threading.Thread(target=lambda: catalog.search_index, name="search-index", daemon=True).start()
+        metrics.inc("catalog_reloads_total")
+        logger.info("Loaded tip catalog version %s (%d tips)", catalog.version, len(catalog))
+        return True
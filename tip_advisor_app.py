@@ -1,223 +1,63 @@
 import streamlit as st
-import json
-import random # To simulate different profiles
-import time   # To simulate delay
+import logging
+import os
+import re
+import sqlite3
+
+from smarttips import metrics
+from smarttips.engine import DEFAULT_CATALOG_PATH, CatalogError, RecommendationEngine
+from smarttips.materialized import RecommendationStore
+from smarttips.store import CACHE_DIR_NAME, CatalogStore
+from smarttips.profiles import ProfileProvider, SimulatedProfileBackend
 
 st.set_page_config(layout="wide", page_title="Energy Tips Advisor", page_icon="💡")
 
 st.title("💡 Personalized Energy Saving Tips Advisor")
 
-# --- Data Loading ---
-@st.cache_data
-def load_tips(filepath="Xcel Tips - 250313.json"):
-    try:
-        with open(filepath, 'r') as f:
-            data = json.load(f)
-        if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
-            st.error(f"Error: JSON structure in {filepath} is not a list of objects.")
-            return []
-        return data
-    except FileNotFoundError:
-        st.error(f"Error: The file {filepath} was not found.")
-        return []
-    except json.JSONDecodeError:
-        st.error(f"Error: Could not decode JSON from {filepath}.")
-        return []
-
-tips_data = load_tips()
-
-if not tips_data:
+# --- Engine Setup ---
+# All recommendation logic lives in the headless smarttips engine; this app
+# only renders it. Resources are shared across sessions via st.cache_resource.
+# The CatalogStore hot-reloads the catalog when the JSON file changes.
+# Results are materialized in SQLite (SMARTTIPS_RESULTS_DB, empty to disable),
+# so repeat lookups of a customer skip evaluation until the profile or catalog changes.
+RESULTS_DB = os.environ.get("SMARTTIPS_RESULTS_DB", os.path.join(CACHE_DIR_NAME, "recommendations.sqlite"))
+
+@st.cache_resource
+def get_engine(filepath=DEFAULT_CATALOG_PATH):
+    # CatalogError propagates so a failed load is not cached
+    store = None
+    if RESULTS_DB:
+        try:
+            store = RecommendationStore(RESULTS_DB)
+        except (OSError, sqlite3.Error) as e:
+            logging.getLogger("tip_advisor_app").warning("Not using the results store %s: %s", RESULTS_DB, e)
+    return RecommendationEngine(CatalogStore(filepath), ProfileProvider(SimulatedProfileBackend()), store=store)
+
+try:
+    engine = get_engine()
+except CatalogError as e:
+    st.error(f"Error: {e}")
+    engine = None
+
+if engine is None or not len(engine.catalog):
     st.warning("Tip data could not be loaded. Please check the JSON file.")
     st.stop()
 
-# --- Placeholder Profile Simulation ---
-def get_profile_for_custid(custid):
-    """Simulates fetching a customer profile based on custid."""
-    # In reality, this would query your NILM output database/API
-    seed = hash(custid) # Use custid hash for pseudo-randomness
-    random.seed(seed)
-    time.sleep(0.5) # Simulate network delay
-
-    profile = {
-        "custid": custid,
-        "👤 User Type": random.choice(["residential", "commercial", "res&com"]),
-        "🧊 Freezer": random.choice(["Yes", "No"]),
-        "🍽️ Dishwasher": random.choice(["Yes", "No"]),
-        "💨 Dryer": random.choice(["Yes", "No"]),
-        "🧺 Washer": random.choice(["Yes", "No"]),
-        "🏊 Pool": random.choice(["Yes", "No"]),
-        "🛁 Hot Tub": random.choice(["Yes", "No"]),
-        "🔥 Pool Heater Months": random.randint(0, 6) if random.choice([True, False]) else 0,
-        "💲 Rate Plan": random.choice(["TOU", "Standard", "EV Rate"]),
-        "🧱 Insulation Pre 1992": random.choice([True, False]),
-        "🌡️ Programmable Thermostat": random.choice(["Yes", "No"]),
-        "💡 CFLs/LEDs": random.choice(["All", "Some", "None"]),
-        "❄️ Cooling System": random.choice(["Yes", "No"]),
-        "⚡ Electric Water Heater": random.choice(["Yes", "No"]),
-        "🌬️ Ducts": random.choice(["No Ducts", "Standard Ducts", "Leaky Ducts"])
-    }
-    # Map internal names used by rules to the display names
-    profile["user_type"] = profile["👤 User Type"]
-    profile["Freezer"] = profile["🧊 Freezer"]
-    profile["Dishwasher"] = profile["🍽️ Dishwasher"]
-    profile["Dryer"] = profile["💨 Dryer"]
-    profile["Washer"] = profile["🧺 Washer"]
-    profile["Pool"] = profile["🏊 Pool"]
-    profile["Hot Tub"] = profile["🛁 Hot Tub"]
-    profile["Pool Heater"] = profile["🔥 Pool Heater Months"] # Map for rule evaluation
-    profile["Rate Plan"] = profile["💲 Rate Plan"]
-    profile["Insulation Pre 1992"] = profile["🧱 Insulation Pre 1992"]
-    profile["Programmable Thermostat"] = profile["🌡️ Programmable Thermostat"]
-    profile["CFLs"] = profile["💡 CFLs/LEDs"] # Assuming CFLs rule maps to this
-    profile["Cool"] = profile["❄️ Cooling System"]
-    profile["Water Heater Electric"] = profile["⚡ Electric Water Heater"]
-    profile["Ducts"] = profile["🌬️ Ducts"]
-    return profile
-
-# --- Rule Evaluation Logic ---
-def get_appliance_from_rule(rule_str):
-    """Attempts to infer the primary appliance/category from a rule string."""
-    rule_str = rule_str.strip()
-    if rule_str == "Always":
-        return "General"
-    
-    # Simple extraction based on the first word after "If"
-    # Covers rules like "If Freezer = ...", "If Pool = ...", "If Rate Plan = ..."
-    if rule_str.startswith("If "):
-        parts = rule_str[3:].split()
-        if parts:
-            # Consider known multi-word entities first
-            if rule_str.startswith("If Pool Heater "):
-                 return "Pool Heater"
-            if rule_str.startswith("If Water Heater "):
-                 return "Water Heater"
-            if rule_str.startswith("If Rate Plan "):
-                 return "Rate Plan" # Categorize as non-appliance general
-            if rule_str.startswith("If Insulation Pre "):
-                 return "Insulation" # Categorize as non-appliance general
-            # Default to the first word if it seems like an appliance/attribute
-            first_word = parts[0]
-            # Add more known appliance/attribute names here if needed
-            known_entities = ["Freezer", "Refrigerator", "Washer", "Dishwasher", "Dryer", 
-                              "Pool", "Hot Tub", "Thermostat", "CFLs", "Cool", "Ducts", "Heater"]
-            if first_word in known_entities:
-                 return first_word
-            # Fallback for other "If" rules - could be general or unclassifiable
-            return "General" # Or perhaps None if we want to be stricter
-            
-    # Complex rules or unknown format
-    if rule_str == "If match on All five Keys":
-         # This rule applies to specific equipment based on other fields, 
-         # but we can't easily map it here without knowing the context.
-         # Let's classify as General for button purposes, filtering happens later.
-         return "General" 
-         
-    return "General" # Default for any other unparsed rules
-
-def evaluate_rule(rule_str, profile):
-    """Evaluates if a tip's rule applies to the customer profile."""
-    rule_str = rule_str.strip()
-    if rule_str == "Always":
-        return True
-
-    if rule_str.startswith("If "):
-        parts = rule_str[3:].split()
-        if len(parts) >= 3:
-            attribute = parts[0]
-            potential_attribute = attribute
-            idx = 1
-            # Handle multi-word attributes based on keys *present* in the profile dict
-            while idx < len(parts) - 1 and (potential_attribute + " " + parts[idx]) in profile:
-                 potential_attribute += " " + parts[idx]
-                 idx += 1
-            
-            if potential_attribute in profile:
-                 attribute = potential_attribute
-                 operator_start_index = idx
-            elif attribute not in profile:
-                return False # Attribute not found
-            else:
-                 operator_start_index = 1 # Single word attribute
-            
-            if attribute not in profile:
-                return False # Should not happen if logic above is correct, but safe check
-                
-            profile_value = profile[attribute]
-            
-            if operator_start_index >= len(parts):
-                return False # Incomplete rule structure
-                
-            operator = parts[operator_start_index]
-            value_parts_start_index = operator_start_index + 1
-            
-            potential_operator = operator
-            idx = operator_start_index + 1
-            # Handle multi-word operators 
-            while idx < len(parts) -1 and (potential_operator + " " + parts[idx]) in ["Not Equal", "Greater than", "Not Equal to"]:
-                potential_operator += " " + parts[idx]
-                idx += 1
-            
-            # Normalize operator names
-            if potential_operator in ["Not Equal", "Not Equal to"]:
-                operator = "Not Equal"
-                value_parts_start_index = idx
-            elif potential_operator == "Greater than":
-                 operator = "Greater than"
-                 value_parts_start_index = idx
-            elif operator not in ["="]:
-                return False # Unsupported operator
-
-            if value_parts_start_index >= len(parts):
-                 return False # Missing value
-            
-            value_str = " ".join(parts[value_parts_start_index:]).strip('"')
+# --- Metrics ---
+# Enabled with SMARTTIPS_METRICS=1. SMARTTIPS_METRICS_PORT serves /metrics and
+# SMARTTIPS_METRICS_FILE is rewritten after each lookup (Prometheus text format).
+logger = logging.getLogger("tip_advisor_app")
+METRICS_FILE = os.environ.get("SMARTTIPS_METRICS_FILE")
 
-            try:
-                if operator == "=":
-                    # Special check for boolean-like profile values
-                    if isinstance(profile_value, bool):
-                        return profile_value == (value_str.lower() == 'yes' or value_str.lower() == 'true')
-                    return str(profile_value) == value_str
-                elif operator == "Not Equal":
-                     if isinstance(profile_value, bool):
-                         return profile_value != (value_str.lower() == 'yes' or value_str.lower() == 'true')
-                     return str(profile_value) != value_str
-                elif operator == "Greater than":
-                     # Attempt numeric comparison first
-                     return float(profile_value) > float(value_str)
-            except (ValueError, TypeError):
-                 # Comparison failed (likely type mismatch)
-                 return False 
-            except Exception as e:
-                 # Log unexpected errors during evaluation
-                 st.warning(f"Internal error evaluating rule '{rule_str}': {e}")
-                 return False
-            
-            return False # Fallthrough if operator logic not met
-        else:
-             return False # "If" rule doesn't have enough parts
-
-    # Handle specific boolean-like rules
-    if rule_str == "If Insulation Pre 1992":
-         # Check if the key exists and is True
-         return profile.get("Insulation Pre 1992", False) is True
-    # Add more specific rule handlers if needed based on JSON analysis
+@st.cache_resource
+def start_metrics_server(port):
+    return metrics.start_http_server(port)
 
-    # Handle complex rules (placeholder)
-    if rule_str == "If match on All five Keys":
-        # Needs definition based on which keys and how they map to profile
-        # Example check (adjust based on actual logic needed):
-        # tip_fuel = tip.get("fuel")
-        # tip_sub1 = tip.get("sub_id1")
-        # tip_sub2 = tip.get("sub_id2")
-        # tip_utype = tip.get("user_type")
-        # profile_fuel = profile.get("PrimaryFuel") # Hypothetical profile key
-        # profile_equip_type = profile.get("EquipmentType") # Hypothetical
-        # return (tip_fuel == profile_fuel and ...)
-        return False # Keep as False until defined
+if metrics.is_enabled() and os.environ.get("SMARTTIPS_METRICS_PORT"):
+    start_metrics_server(int(os.environ["SMARTTIPS_METRICS_PORT"]))
 
-    # Default: Unhandled rule format or rule evaluates to false
-    return False
+# Tips are ranked (smarttips.ranking) and rendered a page at a time
+TIPS_PAGE_SIZE = 10
 
 # --- Session State Initialization ---
 def init_session_state():
@@ -228,6 +68,9 @@ def init_session_state():
     st.session_state.setdefault("processing", False)
     st.session_state.setdefault("detected_appliances", None) # New state
     st.session_state.setdefault("selected_appliance", None) # New state
+    st.session_state.setdefault("eligibility", None) # Memoized EligibilityResult for the current profile
+    st.session_state.setdefault("tips_shown", TIPS_PAGE_SIZE) # How many ranked tips of the category to render
+    st.session_state.setdefault("metrics", metrics.MetricsRegistry(enabled=True)) # This session's numbers
 
 init_session_state() # Ensure state is initialized on each run
 
@@ -240,12 +83,7 @@ if st.session_state.customer_profile:
     with profile_placeholder.container():
         custid = st.session_state.customer_profile.get("custid", "N/A")
         st.subheader(f"Details for {custid}")
-        # Filter out internal mapping keys before displaying JSON
-        display_profile = {k: v for k, v in st.session_state.customer_profile.items() if k not in [
-            "custid", "user_type", "Freezer", "Dishwasher", "Dryer", "Washer", "Pool", 
-            "Hot Tub", "Pool Heater", "Rate Plan", "Insulation Pre 1992", 
-            "Programmable Thermostat", "CFLs", "Cool", "Water Heater Electric", "Ducts"
-        ]}
+        display_profile = st.session_state.customer_profile.display() # Keyed by display labels
         if display_profile:
              st.json(display_profile, expanded=True)
              st.caption("(Simulated data based on ID)")
@@ -256,6 +94,10 @@ else:
 
 # New Chat Button
 st.sidebar.divider()
+st.sidebar.caption(f"Tip catalog version `{engine.catalog.version}` ({len(engine.catalog)} tips)")
+if metrics.is_enabled():
+    with st.sidebar.expander("📊 Metrics (this session)"):
+        st.json(st.session_state.metrics.snapshot(), expanded=True)
 if st.sidebar.button("🔄 Start New Chat", use_container_width=True):
     # Clear relevant session state keys
     st.session_state.messages = []
@@ -264,10 +106,43 @@ if st.sidebar.button("🔄 Start New Chat", use_container_width=True):
     st.session_state.processing = False
     st.session_state.detected_appliances = None # <<< ADDED
     st.session_state.selected_appliance = None # <<< ADDED
+    st.session_state.eligibility = None
     profile_placeholder.info("Enter a Customer ID in the chat to see the simulated profile here.") # Reset sidebar message
     st.rerun() # Rerun to reflect the cleared state
 
-# --- Chat Processing Function ---
+# --- Chat Processing Functions ---
+# Customer IDs are one token with digits (CUST101, BIZ-456); anything else is a tip search
+CUSTID_PATTERN = re.compile(r"[A-Za-z]*[-_]?\d+[\w-]*")
+SEARCH_RESULTS = 10
+
+def process_search_input(query):
+    """Searches tip headlines/descriptions, limited to the current customer's eligible tips if one is loaded."""
+    profile = st.session_state.customer_profile
+    st.session_state.messages.append({"role": "user", "content": f"Search tips: {query}"})
+    try:
+        with metrics.session_metrics(st.session_state.metrics):
+            hits = engine.search(query, profile, limit=SEARCH_RESULTS)
+    except Exception as e:
+        logger.exception("Failed to search tips for %r", query)
+        metrics.inc("errors_total", stage="search")
+        hits = None
+        content = f"Sorry, the search for \"{query}\" failed: {e}"
+    if hits is not None:
+        scope = f"eligible for {profile.get('custid', 'this customer')}" if profile else "in the catalog"
+        if hits:
+            lines = [f"Top {len(hits)} tip(s) {scope} matching \"{query}\":"]
+            for tip, score in hits:
+                description = str(tip.get('description', ''))
+                if len(description) > 160:
+                    description = description[:157].rstrip() + "..."
+                lines.append(f"- **{tip.get('headline', 'No Headline')}** (RowID `{tip.get('rowid', 'N/A')}`, "
+                             f"{tip.get('category', 'N/A')}): {description}")
+            content = "\n".join(lines)
+        else:
+            content = f"No tips {scope} match \"{query}\"."
+    st.session_state.messages.append({"role": "assistant", "content": content})
+    st.rerun()
+
 def process_custid_input(custid):
     """Handles the logic for fetching profile and detecting appliances."""
     if st.session_state.processing: 
@@ -278,6 +153,7 @@ def process_custid_input(custid):
     st.session_state.current_custid = custid
     st.session_state.selected_appliance = None # Reset selected appliance
     st.session_state.detected_appliances = None # Reset detected appliances
+    st.session_state.eligibility = None
     
     # Append user message immediately
     st.session_state.messages.append({"role": "user", "content": f"Get tips for {custid}"})
@@ -294,51 +170,18 @@ if st.session_state.processing and st.session_state.current_custid:
     eligible_categories = [] # Start with empty list of categories with verified tips
     
     with st.chat_message("assistant"):
-        with st.spinner(f"Analyzing profile and verifying tip categories for {custid_to_process}..."):
+        with st.spinner(f"Analyzing profile and verifying tip categories for {custid_to_process}..."), \
+             metrics.session_metrics(st.session_state.metrics), metrics.timer("request_seconds"):
             try:
-                customer_profile = get_profile_for_custid(custid_to_process)
+                with metrics.timer("stage_seconds", stage="profile_fetch"):
+                    customer_profile = engine.provider.get_profile(custid_to_process)
                 st.session_state.customer_profile = customer_profile # Update state
 
-                # --- Determine Potential Categories based on Profile --- 
-                potential_categories = {"General"} # Always check General tips
-                appliance_presence_keys = {
-                    "Freezer": "🧊 Freezer",
-                    "Dishwasher": "🍽️ Dishwasher",
-                    "Dryer": "💨 Dryer",
-                    "Washer": "🧺 Washer",
-                    "Pool": "🏊 Pool",
-                    "Hot Tub": "🛁 Hot Tub",
-                    "Pool Heater": "🔥 Pool Heater Months",
-                }
-                for appliance, profile_key in appliance_presence_keys.items():
-                    profile_value = customer_profile.get(profile_key)
-                    is_present = False
-                    if isinstance(profile_value, str) and profile_value.lower() == "yes": is_present = True
-                    elif isinstance(profile_value, (int, float)) and profile_value > 0: is_present = True
-                    elif isinstance(profile_value, bool) and profile_value is True: is_present = True
-                    if is_present: potential_categories.add(appliance)
-                
-                # Add other potential non-appliance categories based on profile
-                if customer_profile.get("💲 Rate Plan") == "TOU": potential_categories.add("Rate Plan")
-                if customer_profile.get("🧱 Insulation Pre 1992") is True: potential_categories.add("Insulation")
-                # ... add more checks ...
-
-                # --- Verify Tip Availability for each Potential Category --- 
-                for category in potential_categories:
-                    has_eligible_tip = False
-                    for tip in tips_data:
-                        rule = tip.get("rule", "")
-                        # Check 1: Does the tip belong to the category being checked?
-                        tip_category = get_appliance_from_rule(rule)
-                        if tip_category == category:
-                             # Check 2: Does the rule apply to the overall profile?
-                             if evaluate_rule(rule, customer_profile):
-                                 has_eligible_tip = True
-                                 break # Found one eligible tip, no need to check more for this category
-                    
-                    # If a tip matching the profile was found for this category, add category to list for button display
-                    if has_eligible_tip:
-                        eligible_categories.append(category)
+                # --- Detect potential categories and verify each has an eligible tip ---
+                # Computed once and kept in session state; reruns only render it
+                eligibility = engine.eligibility(customer_profile)
+                st.session_state.eligibility = eligibility
+                eligible_categories = eligibility.categories
                 
                 st.session_state.detected_appliances = sorted(eligible_categories) # Store the *verified* categories
                 
@@ -350,9 +193,15 @@ if st.session_state.processing and st.session_state.current_custid:
                      assistant_response_content = f"Based on the profile for {custid_to_process}, I couldn't find any specifically applicable tips in our current database. General energy saving advice may still apply."
 
             except Exception as e:
+                 logger.exception("Failed to process custid %s", custid_to_process)
+                 metrics.inc("errors_total", stage="lookup")
                  st.error(f"An error occurred processing ID {custid_to_process}: {e}", icon="🚨")
                  assistant_response_content = f"Sorry, I couldn't process the request for {custid_to_process}. Please try again."
                  st.session_state.detected_appliances = None # Ensure buttons don't show on error
+                 st.session_state.eligibility = None
+
+    if METRICS_FILE and metrics.is_enabled():
+        metrics.registry.write_prometheus(METRICS_FILE)
 
     # Add the prompt/message to history
     st.session_state.messages.append({"role": "assistant", "content": assistant_response_content})
@@ -398,6 +247,7 @@ if st.session_state.detected_appliances and not st.session_state.selected_applia
         # Use appliance name in button key for uniqueness
         if cols[i].button(f"{appliance_name} Tips", key=f"btn_{appliance_name}", use_container_width=True):
             st.session_state.selected_appliance = appliance_name
+            st.session_state.tips_shown = TIPS_PAGE_SIZE
             # Clear previously displayed tips if any (optional)
             # st.session_state.appliance_specific_tips = [] 
             st.rerun()
@@ -409,22 +259,24 @@ if st.session_state.selected_appliance and st.session_state.customer_profile:
     
     st.subheader(f"✨ Tips for: {selected}") 
     
-    # --- Filter tips based ONLY on selected appliance AND profile rule ---
-    # This filtering logic now matches the verification logic, ensuring tips are found.
-    appliance_specific_tips = []
-    with st.spinner(f"Finding {selected} tips..."): 
-        for tip in tips_data:
-            rule = tip.get("rule", "")
-            tip_category = get_appliance_from_rule(rule)
-            # Check category first (slightly more efficient)
-            if tip_category == selected:
-                # Then check if the rule matches the profile
-                if evaluate_rule(rule, profile):
-                      appliance_specific_tips.append(tip)
+    # --- Reuse the eligibility computed during verification ---
+    # Only recomputed (through the engine's memo) if the catalog was reloaded since.
+    with metrics.session_metrics(st.session_state.metrics), metrics.timer("stage_seconds", stage="tip_filtering"):
+        catalog = engine.catalog
+        eligibility = st.session_state.eligibility
+        if eligibility is None or eligibility.catalog_version != catalog.version:
+            eligibility = st.session_state.eligibility = engine.eligibility(profile, catalog)
+        # Only the ranked tips up to the current page are read and sent to the browser
+        total_tips = eligibility.count(selected)
+        appliance_specific_tips = eligibility.top_tips(selected, catalog, profile.get("user_type"),
+                                                       limit=st.session_state.tips_shown)
+    st.caption(f"Tips for {profile.get('user_type', 'all')} customers, "
+               f"{eligibility.season + ' and year-round' if eligibility.season else 'all seasons'}.")
                      
-    # Display the filtered tips
+    # Display the filtered tips, most relevant first
     if appliance_specific_tips:
-        st.success(f"Found {len(appliance_specific_tips)} specific tip(s) for {selected}.")
+        st.success(f"Found {total_tips} specific tip(s) for {selected}."
+                   + (f" Showing the top {len(appliance_specific_tips)}." if total_tips > len(appliance_specific_tips) else ""))
         for i, tip in enumerate(appliance_specific_tips):
              headline = tip.get('headline', 'No Headline')
              with st.expander(f"💡 Tip {i+1}: {headline}", expanded=True): 
@@ -432,6 +284,10 @@ if st.session_state.selected_appliance and st.session_state.customer_profile:
                 rowid = tip.get('rowid', 'N/A')
                 details = f"RowID: `{rowid}` | Rule: `{tip.get('rule', 'N/A')}` | Category: `{tip.get('category', 'N/A')}` | Fuel: `{tip.get('fuel', 'N/A') or 'Any'}`"
                 st.caption(details)
+        if total_tips > len(appliance_specific_tips):
+            if st.button(f"⬇️ Load more ({total_tips - len(appliance_specific_tips)} remaining)", key="load_more_btn"):
+                st.session_state.tips_shown += TIPS_PAGE_SIZE
+                st.rerun()
     else:
         # This *should* not be reached now due to the verification step.
         st.warning(f"Internal Check: No tips found for '{selected}' after filtering, although the button was displayed. Please review verification logic.")
@@ -444,5 +300,10 @@ if st.session_state.selected_appliance and st.session_state.customer_profile:
 # --- Chat Input Area ---
 # Display Chat Input ONLY if NO appliance is selected (avoid input while viewing tips)
 if not st.session_state.selected_appliance:
-     if prompt := st.chat_input("Enter Customer ID (e.g., CUST123)", disabled=st.session_state.processing, key="chat_input_main"):
-         process_custid_input(prompt.strip()) 
+     if prompt := st.chat_input("Enter Customer ID (e.g., CUST123) or search tips (e.g., pool pump)",
+                                disabled=st.session_state.processing, key="chat_input_main"):
+         prompt = prompt.strip()
+         if CUSTID_PATTERN.fullmatch(prompt):
+             process_custid_input(prompt)
+         elif prompt:
+             process_search_input(prompt) 